@@ -0,0 +1,203 @@
+"""Answer cache for repeated agent questions.
+
+Lookups go through two tiers. The first is an exact match on the normalized
+question. The second is a near-duplicate match: cosine similarity over local
+Ollama embeddings, held in a NumPy matrix. A near-duplicate only counts when
+it mentions the same signed numbers and the same arithmetic operators
+(symbols or words like "times") as the cached question, and contains every
+word of the cached tool-call arguments. So "add 5 and 10" is never answered
+from "add 5 and 11", "divide 2 by 3" never from "multiply 2 by 3", and
+"greet mike" never from "greet john".
+Entries expire after a TTL, the least recently used ones are evicted beyond
+max_entries, and the cache is saved to a JSON file between runs.
+"""
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# A leading minus is a sign unless it follows a digit, as in "2-3"
+NUMBER_PATTERN = re.compile(r"(?<![\d.])-?\d+(?:\.\d+)?")
+WORD_PATTERN = re.compile(r"[a-z][a-z'\-]*")
+# Symbols, plus hyphens that are not inside a word like "mary-ann"
+OPERATOR_PATTERN = re.compile(r"\*\*|[+*/%^]|(?<![a-z])-(?![a-z])")
+OPERATOR_WORDS = {
+    "+": ("plus", "add", "added", "sum"),
+    "-": ("minus", "subtract", "subtracted", "difference", "less"),
+    "*": ("times", "multiply", "multiplied", "product"),
+    "/": ("divide", "divided", "over", "quotient"),
+    "%": ("mod", "modulo", "remainder"),
+    "**": ("power", "squared", "cubed"),
+}
+OPERATOR_BY_WORD = {word: symbol for symbol, words in OPERATOR_WORDS.items() for word in words}
+
+
+def normalize(text):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", text.strip().lower()).rstrip(" .?!")
+
+
+def numbers_in(text):
+    return [float(n) for n in NUMBER_PATTERN.findall(text)]
+
+
+def operators_in(text):
+    """Arithmetic operators in text, whether written as symbols or words, as a sorted list."""
+    text = text.lower()
+    operators = ["**" if op == "^" else op for op in OPERATOR_PATTERN.findall(text)]
+    operators += [OPERATOR_BY_WORD[word] for word in WORD_PATTERN.findall(text) if word in OPERATOR_BY_WORD]
+    return sorted(operators)
+
+
+def argument_terms(tool_calls):
+    """Words from the string arguments of the tool calls that produced an answer."""
+    terms = set()
+    for call in tool_calls:
+        for value in (call.get("args") or {}).values():
+            if isinstance(value, str):
+                terms.update(WORD_PATTERN.findall(value.lower()))
+    return sorted(terms)
+
+
+class AnswerCache:
+    def __init__(self, path=None, embeddings=None, threshold=0.92, max_entries=512, ttl=7 * 24 * 3600):
+        self.path = path
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # normalized question -> entry dict
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._matrix = None  # unit-normalized embeddings, rows aligned with _keys
+        self._keys = []
+        self._last_query = (None, None)  # reuse the miss's embedding when the answer is put
+        if path and os.path.exists(path):
+            self.load()
+
+    # Lookups
+
+    def get(self, question):
+        """Return a cached answer for question, or None."""
+        key = normalize(question)
+        self._expire()
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["answer"]
+
+        match = self._nearest(question)
+        if match is not None:
+            self.entries.move_to_end(match)
+            self.semantic_hits += 1
+            return self.entries[match]["answer"]
+
+        self.misses += 1
+        return None
+
+    def _nearest(self, question):
+        if self.embeddings is None or not self.entries:
+            return None
+        query = self._embed(question)
+        if query is None:
+            return None
+        self._last_query = (question, query)
+
+        if self._matrix is None:
+            self._keys = [k for k, e in self.entries.items() if e.get("vector") is not None]
+            if not self._keys:
+                return None
+            self._matrix = np.array([self.entries[k]["vector"] for k in self._keys], dtype=np.float32)
+
+        scores = self._matrix @ query
+        numbers = numbers_in(question)
+        operators = operators_in(question)
+        words = set(WORD_PATTERN.findall(question.lower()))
+        for index in np.argsort(scores)[::-1]:
+            if scores[index] < self.threshold:
+                break
+            entry = self.entries[self._keys[index]]
+            # Entries saved before operators were recorded have no "operators" and only match exactly
+            if (entry["numbers"] == numbers and entry.get("operators") == operators
+                    and words.issuperset(entry["terms"])):
+                return self._keys[index]
+        return None
+
+    def _embed(self, text):
+        try:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        except Exception as e:
+            print(f"[cache] embeddings unavailable, using exact matches only: {e}")
+            self.embeddings = None
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # Updates
+
+    def put(self, question, answer, tool_calls=()):
+        """Cache answer for question; tool_calls are the calls that produced it."""
+        key = normalize(question)
+        vector = None
+        if self.embeddings is not None:
+            last_question, last_vector = self._last_query
+            vector = last_vector if last_question == question else self._embed(question)
+        self.entries[key] = {
+            "answer": answer,
+            "created": time.time(),
+            "numbers": numbers_in(question),
+            "operators": operators_in(question),
+            "terms": argument_terms(tool_calls),
+            "vector": vector.tolist() if vector is not None else None,
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._matrix = None
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [k for k, e in self.entries.items() if e["created"] < cutoff]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self._matrix = None
+
+    # Persistence
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = OrderedDict(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"[cache] ignoring unreadable cache file {self.path}: {e}")
+            self.entries = OrderedDict()
+        self._matrix = None
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    # Reporting
+
+    @property
+    def hits(self):
+        return self.exact_hits + self.semantic_hits
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"[cache] {self.hits}/{lookups} hits ({rate:.0%}; exact {self.exact_hits},"
+            f" similar {self.semantic_hits}) | {len(self.entries)} entries"
+        )
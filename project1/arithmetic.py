@@ -0,0 +1,242 @@
+"""Safe arithmetic evaluation for the calculator tool.
+
+Expressions are parsed with ``ast`` and compiled into small closures instead of
+going through ``eval``. Only numeric literals, parentheses, unary +/- and the
+binary operators + - * / // % ** are accepted, and operand size, exponent and
+nesting depth are bounded so a single input cannot stall the worker.
+"""
+import ast
+import operator
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # batch evaluation falls back to the scalar path
+    np = None
+
+MAX_EXPRESSION_LENGTH = 256
+MAX_DEPTH = 32
+MAX_EXPONENT = 128
+MAX_MAGNITUDE = 10 ** 100
+# Every integer below this is exact in float64; int results past it are left to the scalar path
+MAX_EXACT_INT = 2 ** 53
+# float64 can't be trusted to reproduce these on ints, so shapes that apply them to ints are never vectorized
+INT_ONLY_OPERATORS = ("Pow", "Mod", "FloorDiv")
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression is malformed, unsupported or exceeds the limits."""
+
+
+def _check_magnitude(value):
+    if isinstance(value, complex):
+        raise ExpressionError("result is not a real number")
+    if abs(value) > MAX_MAGNITUDE:
+        raise ExpressionError(f"value exceeds the limit of 1e{len(str(MAX_MAGNITUDE)) - 1}")
+    return value
+
+
+def _exact(values):
+    """NaN wherever an integer-valued array may have lost precision in float64."""
+    return np.where(np.abs(values) < MAX_EXACT_INT, values, np.nan)
+
+
+def _apply_binary(op, left, right):
+    if op is operator.pow and abs(right) > MAX_EXPONENT:
+        raise ExpressionError(f"exponent {right} exceeds the limit of {MAX_EXPONENT}")
+    try:
+        return _check_magnitude(op(left, right))
+    except ZeroDivisionError:
+        raise ExpressionError("division by zero") from None
+    except OverflowError:
+        raise ExpressionError("result is too large") from None
+
+
+class CompiledExpression:
+    """A validated expression, compiled once and reusable across calls.
+
+    ``template`` identifies the expression's shape with its numbers left out, so
+    expressions that differ only in their constants can be evaluated together.
+    """
+
+    __slots__ = ("source", "constants", "template", "_scalar", "_vector")
+
+    def __init__(self, source, constants, template, scalar, vector):
+        self.source = source
+        self.constants = constants
+        self.template = template
+        self._scalar = scalar
+        self._vector = vector
+
+    def evaluate(self):
+        return self._scalar(self.constants)
+
+
+def _compile_node(node, constants, depth):
+    """Return (scalar_fn, vector_fn, template) for an AST node."""
+    if depth > MAX_DEPTH:
+        raise ExpressionError(f"expression is nested deeper than {MAX_DEPTH} levels")
+
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ExpressionError(f"unsupported literal {value!r}")
+        _check_magnitude(value)
+        index = len(constants)
+        constants.append(value)
+        slot = lambda values: values[index]
+        vector = (lambda values: _exact(values[index])) if isinstance(value, int) else slot
+        return slot, vector, type(value).__name__
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op = UNARY_OPERATORS[type(node.op)]
+        operand, vector_operand, template = _compile_node(node.operand, constants, depth + 1)
+        return (
+            lambda values: op(operand(values)),
+            lambda values: op(vector_operand(values)),
+            (type(node.op).__name__, template),
+        )
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        op = BINARY_OPERATORS[type(node.op)]
+        left, vector_left, left_template = _compile_node(node.left, constants, depth + 1)
+        right, vector_right, right_template = _compile_node(node.right, constants, depth + 1)
+        template = (type(node.op).__name__, left_template, right_template)
+        integer = _is_int_template(template)
+
+        def vector(values):
+            a, b = vector_left(values), vector_right(values)
+            if op is operator.pow:
+                # Out-of-range exponents become NaN and are re-run on the scalar path
+                in_range = np.abs(b) <= MAX_EXPONENT
+                result = np.where(in_range, np.power(a, np.where(in_range, b, 0)), np.nan)
+            else:
+                result = op(a, b)
+            # Same per-operation limit as _apply_binary, so an out-of-range intermediate
+            # is re-run on the scalar path even if the final value is back in range
+            result = np.where(np.abs(result) <= MAX_MAGNITUDE, result, np.nan)
+            # Exact operands give an exact float64 result whenever it is below MAX_EXACT_INT
+            return _exact(result) if integer else result
+
+        return (
+            lambda values: _apply_binary(op, left(values), right(values)),
+            vector,
+            template,
+        )
+
+    raise ExpressionError(f"unsupported syntax: {type(node).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression):
+    """Parse and validate an expression; results are cached by source text."""
+    source = expression.strip()
+    if not source:
+        raise ExpressionError("empty expression")
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError:
+        raise ExpressionError(f"could not parse '{source}'") from None
+
+    constants = []
+    scalar, vector, template = _compile_node(tree.body, constants, 0)
+    return CompiledExpression(source, tuple(constants), template, scalar, vector)
+
+
+def evaluate(expression):
+    """Evaluate a single arithmetic expression, raising ExpressionError on bad input."""
+    return compile_expression(expression).evaluate()
+
+
+def _evaluate_or_error(compiled_or_error):
+    if isinstance(compiled_or_error, ExpressionError):
+        return compiled_or_error
+    try:
+        return compiled_or_error.evaluate()
+    except ExpressionError as e:
+        return e
+
+
+def evaluate_batch(expressions):
+    """Evaluate many expressions in one call.
+
+    Returns one entry per input, either the numeric result or the
+    ExpressionError explaining why it was rejected. Expressions that share a
+    shape and involve float arithmetic are evaluated together as NumPy arrays;
+    any element that comes back non-finite or out of range, or whose integer
+    parts may not be exact in float64, is re-run on the scalar path so it gets
+    the same result or error as ``evaluate``.
+    """
+    compiled = []
+    for expression in expressions:
+        try:
+            compiled.append(compile_expression(expression))
+        except ExpressionError as e:
+            compiled.append(e)
+
+    results = [None] * len(compiled)
+    groups = {}
+    for i, item in enumerate(compiled):
+        if isinstance(item, CompiledExpression) and np is not None and _is_vectorizable(item.template):
+            groups.setdefault(item.template, []).append(i)
+        else:
+            results[i] = _evaluate_or_error(item)
+
+    for indices in groups.values():
+        if len(indices) == 1:
+            results[indices[0]] = _evaluate_or_error(compiled[indices[0]])
+            continue
+
+        columns = np.array([compiled[i].constants for i in indices], dtype=np.float64).T
+        with np.errstate(all="ignore"):
+            values = np.asarray(compiled[indices[0]]._vector(list(columns)), dtype=np.float64)
+        valid = np.isfinite(values) & (np.abs(values) <= MAX_MAGNITUDE)
+        for i, value, ok in zip(indices, values.tolist(), valid.tolist()):
+            results[i] = value if ok else _evaluate_or_error(compiled[i])
+
+    return results
+
+
+def _is_vectorizable(template):
+    """True when float64 arrays reproduce Python's result for this shape, up to the checks in the vector path."""
+    return _is_float_template(template) and not _has_int_only_operator(template)
+
+
+def _is_int_template(template):
+    """True when Python would evaluate this shape with int arithmetic only."""
+    if isinstance(template, tuple):
+        return template[0] != "Div" and all(_is_int_template(t) for t in template[1:])
+    return template == "int"
+
+
+def _has_int_only_operator(template):
+    if not isinstance(template, tuple):
+        return False
+    if template[0] in INT_ONLY_OPERATORS and _is_int_template(template):
+        return True
+    return any(_has_int_only_operator(t) for t in template[1:])
+
+
+def _is_float_template(template):
+    """True when Python would evaluate this shape with float arithmetic anyway."""
+    if template == "float":
+        return True
+    if isinstance(template, tuple):
+        return template[0] == "Div" or any(_is_float_template(t) for t in template[1:])
+    return False
@@ -0,0 +1,147 @@
+"""Headless batch mode: run JSONL prompts through the agent with bounded concurrency."""
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+
+def read_prompts(path):
+    """Yield (id, prompt, error) triples from a JSONL file.
+
+    Each line is either a JSON string or an object with a "prompt" (or
+    "input") field and an optional "id"; the line number is used when no id
+    is given. Blank lines are skipped. A malformed line yields its line
+    number as the id, no prompt and an error naming the line, so it is
+    reported in the results instead of aborting the run.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"line {line_number}: invalid JSON ({e})"
+                continue
+            if isinstance(record, str):
+                yield line_number, record, None
+            elif isinstance(record, dict):
+                yield record.get("id", line_number), record.get("prompt", record.get("input", "")), None
+            else:
+                yield line_number, None, f"line {line_number}: expected a string or an object, got {type(record).__name__}"
+
+
+def summarize_response(messages):
+    """Pull the final answer and the tool calls (with their results) out of an agent response."""
+    tool_calls = {}
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                tool_calls[call["id"]] = {"name": call["name"], "args": call["args"], "result": None}
+        elif isinstance(message, ToolMessage) and message.tool_call_id in tool_calls:
+            tool_calls[message.tool_call_id]["result"] = message.content
+
+    final_message = messages[-1] if messages else None
+    answer = final_message.content if isinstance(final_message, AIMessage) else None
+    return answer, list(tool_calls.values())
+
+
+async def run_prompt(agent_executor, item_id, prompt, config=None):
+    """Run a single prompt and return its result record; errors are recorded, not raised."""
+    start = time.perf_counter()
+    record = {"id": item_id, "prompt": prompt}
+    try:
+        response = await agent_executor.ainvoke({"messages": [HumanMessage(content=prompt)]}, config)
+        record["answer"], record["tool_calls"] = summarize_response(response["messages"])
+        record["error"] = None
+    except Exception as e:
+        record["answer"], record["tool_calls"] = None, []
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+async def run_batch(agent_executor, input_path, output_path, concurrency=4, order="arrival", config=None):
+    """Run every prompt in input_path through the agent and write JSONL results to output_path.
+
+    At most ``concurrency`` prompts are in flight at once. Prompts are read
+    lazily, so memory stays bounded for large files. With order="arrival"
+    results are written in input order (finished results wait for earlier
+    ones); with order="completion" each result is written as soon as it is
+    done. Either way at most ``concurrency * 4`` prompts are read but not yet
+    written, so one slow prompt cannot make the arrival-order backlog grow
+    without bound; reading pauses until it finishes.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    done = asyncio.Queue()
+    window = asyncio.Semaphore(concurrency * 4)
+    start = time.perf_counter()
+
+    async def producer():
+        try:
+            for seq, (item_id, prompt, error) in enumerate(read_prompts(input_path)):
+                await window.acquire()
+                if error is not None:
+                    await done.put((seq, {"id": item_id, "prompt": None, "answer": None, "tool_calls": [],
+                                          "error": error, "latency": 0.0}))
+                    continue
+                await queue.put((seq, item_id, prompt))
+        finally:
+            # Always release the workers, even if the input file is malformed
+            for _ in range(concurrency):
+                await queue.put(None)
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            seq, item_id, prompt = item
+            await done.put((seq, await run_prompt(agent_executor, item_id, prompt, config)))
+        await done.put(None)
+
+    tasks = [asyncio.create_task(producer())]
+    tasks += [asyncio.create_task(worker()) for _ in range(concurrency)]
+
+    written = errors = 0
+    latencies = []
+    pending = {}
+    next_seq = 0
+    running = concurrency
+    with open(output_path, "w", encoding="utf-8") as out:
+        while running:
+            result = await done.get()
+            if result is None:
+                running -= 1
+                continue
+
+            seq, record = result
+            if record["prompt"] is not None:
+                latencies.append(record["latency"])
+            errors += record["error"] is not None
+
+            if order == "completion":
+                ready = [record]
+            else:
+                pending[seq] = record
+                ready = []
+                while next_seq in pending:
+                    ready.append(pending.pop(next_seq))
+                    next_seq += 1
+
+            for record in ready:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                written += 1
+                window.release()
+            out.flush()
+
+    await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - start
+    mean = sum(latencies) / len(latencies) if latencies else 0.0
+    return (
+        f"Batch complete: {written} prompts ({errors} errors) in {elapsed:.2f}s"
+        f" | mean latency {mean:.2f}s | {written / elapsed if elapsed else 0:.2f} prompts/s"
+        f" | results in {output_path}"
+    )
@@ -0,0 +1,121 @@
+"""Deterministic pre-routing for inputs the local tools can answer without the LLM."""
+import re
+import time
+
+NUMBER = r"[-+]?\d+(?:\.\d+)?"
+# The full number the calculator tool returned: "The result of 7/2 is 3.5", "... is -1e+100"
+CALCULATOR_RESULT_PATTERN = re.compile(r"^The result of .* is (?P<value>-?\d+(?:\.\d+)?(?:e[+-]?\d+)?)$", re.DOTALL)
+
+# "2*3+4", "what is (10-5)/2?", "calculate 7 * 6 ="
+ARITHMETIC_PATTERN = re.compile(
+    r"^(?:(?P<keyword>what\s+is|what's|calculate|compute|evaluate)\s+)?"
+    r"(?P<expression>[\d\s+\-*/.()]+?)\s*(?P<suffix>[=?]?)$",
+    re.IGNORECASE,
+)
+# "555-1234", "2024-01-15", "(555)-123-4567": phone numbers, dates and IDs, unless asked as a calculation
+HYPHENATED_DIGITS_PATTERN = re.compile(r"^\(?\d+\)?(?:-\d+)+$")
+# "add 5 and 10", "please add 2.5 to 4", "what is the sum of 3 and 4?"
+ADD_PATTERN = re.compile(
+    rf"^(?:please\s+)?(?:add|(?:what\s+is\s+|what's\s+)?the\s+sum\s+of|sum)\s+"
+    rf"(?P<a>{NUMBER})\s+(?:and|to|plus|\+)\s+(?P<b>{NUMBER})\s*[.?!]*$",
+    re.IGNORECASE,
+)
+# "say hello to John", "greet Mary Ann", "say hi to O'Neil!"
+HELLO_PATTERN = re.compile(
+    r"^(?:please\s+)?(?:say\s+(?:hello|hi)\s+to|greet)\s+"
+    r"(?P<name>[A-Za-z][A-Za-z'\-]*(?:\s+[A-Za-z][A-Za-z'\-]*){0,2})\s*[.!]*$",
+    re.IGNORECASE,
+)
+
+
+def format_tool_result(tool_result):
+    """Reduce calculator results to just the number; other tool results are shown as-is."""
+    match = CALCULATOR_RESULT_PATTERN.match(tool_result)
+    return match["value"] if match else tool_result
+
+
+class FastPathRouter:
+    """Answers simple inputs by calling the matching tool directly.
+
+    Anything that does not match one of the patterns exactly, or that the
+    tool rejects, returns None so the caller falls through to the agent.
+    """
+
+    def __init__(self, tools):
+        self.tools = {t.name: t for t in tools}
+        self.turns = 0
+        self.hits = 0
+        self.time_saved = 0.0
+        self.last_elapsed = 0.0
+        self.agent_latency = None  # moving average of agent turns, in seconds
+
+    def match(self, user_input):
+        """Return (tool_name, tool_args) for inputs a tool can answer directly, else None."""
+        text = user_input.strip()
+
+        match = ADD_PATTERN.match(text)
+        if match and "add_numbers" in self.tools:
+            return "add_numbers", {"a": float(match["a"]), "b": float(match["b"])}
+
+        match = HELLO_PATTERN.match(text)
+        if match and "say_hello" in self.tools:
+            return "say_hello", {"name": match["name"]}
+
+        match = ARITHMETIC_PATTERN.match(text)
+        if match and "calculator" in self.tools:
+            expression = match["expression"].strip()
+            if HYPHENATED_DIGITS_PATTERN.match(expression) and not (match["keyword"] or match["suffix"] == "="):
+                return None
+            # A bare number is not a calculation; let the agent decide what was meant
+            if re.search(r"\d", expression) and re.search(r"\d\s*[+\-*/]", expression):
+                return "calculator", {"expression": expression}
+
+        return None
+
+    def route(self, user_input):
+        """Try to answer user_input without the model; returns the tool result or None."""
+        self.turns += 1
+        routed = self.match(user_input)
+        if routed is None:
+            return None
+
+        tool_name, tool_args = routed
+        start = time.perf_counter()
+        try:
+            result = self.tools[tool_name].invoke(tool_args)
+        except Exception:
+            return None
+        elapsed = time.perf_counter() - start
+
+        if result.startswith("Error"):
+            return None
+
+        self.hits += 1
+        self.last_elapsed = elapsed
+        if self.agent_latency is not None:
+            self.time_saved += max(self.agent_latency - elapsed, 0.0)
+        return result
+
+    def record_agent_latency(self, seconds):
+        """Feed the latency of a turn that went through the agent into the baseline."""
+        if self.agent_latency is None:
+            self.agent_latency = seconds
+        else:
+            self.agent_latency = 0.8 * self.agent_latency + 0.2 * seconds
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.turns if self.turns else 0.0
+
+    def report(self, hit):
+        """One-line summary of this turn and the session so far."""
+        if hit:
+            turn = f"hit in {self.last_elapsed * 1e6:.0f}µs"
+            if self.agent_latency is not None:
+                turn += f", saved ~{max(self.agent_latency - self.last_elapsed, 0.0):.2f}s"
+        else:
+            turn = "miss"
+        return (
+            f"[fast path] {turn} | hit rate {self.hits}/{self.turns} ({self.hit_rate:.0%})"
+            f" | total saved ~{self.time_saved:.2f}s"
+        )
@@ -1,9 +1,25 @@
 from langchain_core.messages import HumanMessage
-from langchain_ollama import ChatOllama
+from langchain_ollama import ChatOllama, OllamaEmbeddings
 from langchain.tools import tool
 from langgraph.prebuilt import create_react_agent
+from langgraph.checkpoint.memory import MemorySaver
 from dotenv import load_dotenv
-import re
+from fast_path import FastPathRouter, format_tool_result
+from streaming import stream_turn
+from batch import run_batch
+from memory import build_history_hook
+from tracing import AgentTracer
+from warmup import ModelWarmup, parse_keep_alive
+from answer_cache import AnswerCache
+from ollama_pool import EndpointPool, PooledAgent
+from ollama import Client
+import arithmetic
+import argparse
+import asyncio
+import atexit
+import os
+import time
+import uuid
 
 load_dotenv()
 
@@ -12,14 +28,10 @@ def calculator(expression: str) -> str:
     """Useful for performing basic arithmetic calculations. Pass mathematical expressions like '1+1', '2*3', '10-5', etc."""
     print(f"Calculator tool called with: {expression}")
     try:
-        # Simple evaluation for basic arithmetic (be careful with eval in production)
-        # This is a simplified version - consider using a proper math parser for production
-        allowed_chars = set('0123456789+-*/.()')
-        if not all(c in allowed_chars or c.isspace() for c in expression):
-            return f"Error: Invalid characters in expression '{expression}'"
-        
-        result = eval(expression)
+        result = arithmetic.evaluate(expression)
         return f"The result of {expression} is {result}"
+    except arithmetic.ExpressionError as e:
+        return f"Error: Invalid expression '{expression}': {e}"
     except Exception as e:
         return f"Error calculating {expression}: {str(e)}"
 
@@ -35,76 +47,251 @@ def say_hello(name: str) -> str:
     print(f"Hello tool called for: {name}")
     return f"Hello {name}, I hope you are well today!"
 
-def main():
+TOOLS = [calculator, add_numbers, say_hello]
+
+MODEL_NAME = "llama3.2:3b"  # Try this larger model for better tool selection
+OLLAMA_URL = "http://localhost:11434"
+
+SYSTEM_PROMPT = """You are a helpful assistant with access to tools.
+- Use the calculator tool for mathematical expressions like '1+1', '2*3+4'
+- Use the add_numbers tool when asked to add two specific numbers
+- Use the say_hello tool when asked to greet someone or say hello
+- Always provide the exact result from the tool, nothing more
+- Don't add extra phrases or ask follow-up questions"""
+
+def build_agent(memory=False, max_history_tokens=2048, summarize=False, keep_alive=None,
+                base_url=OLLAMA_URL, checkpointer=None):
+    """Create the ReAct agent backed by the local Ollama model
+
+    With memory=True the agent keeps per-thread conversation history in a
+    checkpointer, bounded to max_history_tokens (older turns are summarized
+    instead of dropped when summarize=True). keep_alive controls how long
+    Ollama keeps the model loaded between requests.
+    """
     # Use Ollama Chat Model with better parameters for tool use
     model = ChatOllama(
-        model="llama3.2:3b",  # Try this larger model for better tool selection
-        base_url="http://localhost:11434",
+        model=MODEL_NAME,
+        base_url=base_url,
         temperature=0,
+        keep_alive=keep_alive,
     )
     
-    tools = [calculator, add_numbers, say_hello]
+    memory_options = {}
+    if memory:
+        memory_options = {
+            "checkpointer": checkpointer or MemorySaver(),
+            "pre_model_hook": build_history_hook(max_history_tokens, model if summarize else None),
+        }
     
-    agent_executor = create_react_agent(
+    return create_react_agent(
         model=model,
-        tools=tools,
-        debug=False  # Turn off debug to remove all the verbose output
+        tools=TOOLS,
+        prompt=SYSTEM_PROMPT,  # Same SystemMessage every call, so Ollama can reuse the cached prefix
+        debug=False,  # Turn off debug to remove all the verbose output
+        **memory_options
     )
+
+def build_pooled_agent(urls, memory=False, hedge_after=None, **kwargs):
+    """One agent per Ollama server behind a least-loaded router; a plain agent for a single server
+
+    The agents share one checkpointer, so memory follows the conversation
+    whichever server answers a turn.
+    """
+    if len(urls) == 1:
+        return build_agent(memory=memory, base_url=urls[0], **kwargs)
+    checkpointer = MemorySaver() if memory else None
+    agents = {url: build_agent(memory=memory, base_url=url, checkpointer=checkpointer, **kwargs) for url in urls}
+    pool = EndpointPool(urls, probe=lambda url: [m.model for m in Client(host=url, timeout=5).list().models]).start()
+    return PooledAgent(pool, agents, MODEL_NAME, hedge_after)
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local AI assistant with tools, running on Ollama")
+    parser.add_argument("--no-stream", dest="stream", action="store_false",
+                        help="Wait for the full answer instead of streaming tokens as they are generated")
+    parser.add_argument("--batch", metavar="PROMPTS.jsonl",
+                        help="Run prompts from a JSONL file headlessly instead of starting the chat")
+    parser.add_argument("--output", metavar="RESULTS.jsonl",
+                        help="Where to write batch results (default: <input>.results.jsonl)")
+    parser.add_argument("--concurrency", type=positive_int, default=4,
+                        help="Maximum number of prompts in flight at once in batch mode")
+    parser.add_argument("--order", choices=["arrival", "completion"], default="arrival",
+                        help="Write batch results in input order or as soon as each one finishes")
+    parser.add_argument("--memory-tokens", type=int, default=2048,
+                        help="Token budget for the conversation history kept between turns")
+    parser.add_argument("--summarize", action="store_true",
+                        help="Summarize old turns instead of dropping them when over the memory budget")
+    parser.add_argument("--trace", metavar="TRACE.jsonl",
+                        help="Record model, tool and node spans as JSON lines and print latency percentiles on exit")
+    parser.add_argument("--prometheus", metavar="METRICS.prom",
+                        help="Also write the collected metrics in Prometheus text format on exit")
+    parser.add_argument("--keep-alive", default="30m",
+                        help="How long Ollama keeps the model loaded after a request, e.g. '30m', '2h' or -1 for forever")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false",
+                        help="Don't preload the model in the background at startup")
+    parser.add_argument("--cache", default=".answer_cache.json", metavar="CACHE.json",
+                        help="File that persists cached answers between runs")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Always ask the agent, even for questions answered before")
+    parser.add_argument("--ollama-url", dest="ollama_urls", action="append", metavar="URL",
+                        help=f"Ollama server to use (default {OLLAMA_URL}); repeat to spread requests over several servers")
+    parser.add_argument("--hedge-after", type=float, metavar="SECONDS",
+                        help="In batch mode with several servers, retry a prompt that is still running after this long "
+                             "on another server and keep the first answer")
+    parser.add_argument("--embed-model", default="nomic-embed-text",
+                        help="Ollama embedding model for near-duplicate cache lookups ('' for exact matches only)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    tracer = None
+    if args.trace or args.prometheus:
+        tracer = AgentTracer(args.trace)
+    try:
+        run(args, tracer)
+    finally:
+        if tracer:
+            print("\nLatency summary:")
+            print(tracer.summary())
+            if args.prometheus:
+                tracer.write_prometheus(args.prometheus)
+            tracer.close()
+
+def new_session_config(tracer):
+    """Run config for a fresh conversation thread, with the tracer attached if enabled"""
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    if tracer:
+        config["callbacks"] = [tracer]
+    return config
+
+def run(args, tracer):
+    keep_alive = parse_keep_alive(args.keep_alive)
+    urls = args.ollama_urls or [OLLAMA_URL]
+
+    if args.batch:
+        # Batch prompts are independent, so they run without conversation memory
+        agent_executor = build_pooled_agent(urls, hedge_after=args.hedge_after, keep_alive=keep_alive)
+        if args.warmup:
+            warmups = [ModelWarmup(url, MODEL_NAME, keep_alive).start() for url in urls]
+            for warmup in warmups:
+                warmup.wait()
+                print(warmup.report())
+        output = args.output or f"{os.path.splitext(args.batch)[0]}.results.jsonl"
+        summary = asyncio.run(run_batch(
+            agent_executor, args.batch, output,
+            concurrency=args.concurrency, order=args.order,
+            config={"callbacks": [tracer]} if tracer else None,
+        ))
+        print(summary)
+        if isinstance(agent_executor, PooledAgent):
+            print(agent_executor.pool.report())
+            if args.hedge_after:
+                print(f"[pool] {agent_executor.hedges} hedged requests, {agent_executor.hedge_wins} won by the hedge")
+        return
     
+    # Load the model while the banner is shown and the user types their first question
+    if args.warmup:
+        for url in urls:
+            ModelWarmup(url, MODEL_NAME, keep_alive, on_ready=lambda w: print(f"\n{w.report()}")).start()
+
+    agent_executor = build_pooled_agent(
+        urls, memory=True, max_history_tokens=args.memory_tokens, summarize=args.summarize, keep_alive=keep_alive
+    )
+    config = new_session_config(tracer)
+    # Agent turns in this conversation; answers that may lean on earlier turns ("add 2 to that") aren't cached
+    history_turns = 0
+
     print("Welcome! I'm your AI assistant running locally with Ollama.")
-    print("Type 'quit' to exit. You can ask me to:")
+    print("Type 'quit' to exit, or 'reset' to start a new conversation. You can ask me to:")
     print("- Calculate math expressions (e.g., '1+1', '2*3+4')")
     print("- Add two numbers (e.g., 'add 5 and 10')")
     print("- Say hello (e.g., 'say hello to John')")
 
+    router = FastPathRouter(TOOLS)
+
+    cache = None
+    if args.use_cache:
+        embeddings = OllamaEmbeddings(model=args.embed_model, base_url=urls[0]) if args.embed_model else None
+        cache = AnswerCache(args.cache, embeddings)
+        atexit.register(cache.save)
+
     while True:
         user_input = input("\nYou: ").strip()
         if user_input.lower() in ['quit', 'exit']:
             print("Goodbye!")
             break
+        if user_input.lower() == 'reset':
+            config = new_session_config(tracer)
+            history_turns = 0
+            print("Started a new conversation.")
+            continue
         
         print("Assistant:", end=" ")
+
+        # Answer simple arithmetic and greetings directly from the tools
+        tool_result = router.route(user_input)
+        if tool_result is not None:
+            print(format_tool_result(tool_result))
+            print(router.report(hit=True))
+            continue
+
+        # Then repeated questions whose tool-derived answer is already known. Only on a fresh
+        # conversation: a follow-up can look like a cached standalone question but mean something else
+        cacheable = cache is not None and history_turns == 0
+        if cacheable:
+            answer = cache.get(user_input)
+            if answer is not None:
+                print(answer)
+                print(cache.report())
+                continue
+
         try:
-            # Add system message as part of the conversation
-            system_prompt = """You are a helpful assistant with access to tools. 
-            - Use the calculator tool for mathematical expressions like '1+1', '2*3+4'
-            - Use the add_numbers tool when asked to add two specific numbers
-            - Use the say_hello tool when asked to greet someone or say hello
-            - Always provide the exact result from the tool, nothing more
-            - Don't add extra phrases or ask follow-up questions"""
+            # Only the new message is sent; history and the system prompt come from the agent
+            messages = [HumanMessage(content=user_input)]
+            history_turns += 1
             
-            # Create message list with system context
-            from langchain_core.messages import SystemMessage
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_input)
-            ]
-            
-            response = agent_executor.invoke({"messages": messages})
+            start = time.perf_counter()
+            if args.stream:
+                stats = stream_turn(agent_executor, {"messages": messages}, config)
+                router.record_agent_latency(time.perf_counter() - start)
+                # Only answers that came from a tool are deterministic enough to reuse
+                if cacheable and stats.tool_calls and stats.text.strip():
+                    cache.put(user_input, stats.text.strip(), stats.tool_calls)
+                print(stats.summary())
+                print(router.report(hit=False))
+                if cache:
+                    print(cache.report())
+                continue
+
+            response = agent_executor.invoke({"messages": messages}, config)
+            router.record_agent_latency(time.perf_counter() - start)
             
-            # Find the tool result in the messages
+            # Find the tool result among this turn's messages
+            turn_messages = response["messages"]
+            for i in range(len(turn_messages) - 1, -1, -1):
+                if isinstance(turn_messages[i], HumanMessage):
+                    turn_messages = turn_messages[i + 1:]
+                    break
+
             tool_result = None
-            for message in response["messages"]:
+            for message in turn_messages:
                 if hasattr(message, 'name') and message.name in ['calculator', 'add_numbers', 'say_hello']:
                     tool_result = message.content
                     break
             
             # If we found a tool result, use it directly
             if tool_result:
-                # Clean up the tool result
-                if "The result of" in tool_result and "is" in tool_result:
-                    # Extract just the number from calculator results
-                    import re
-                    number_match = re.search(r'is (\d+)', tool_result)
-                    if number_match:
-                        print(number_match.group(1))
-                    else:
-                        print(tool_result)
-                elif "Hello" in tool_result:
-                    # For greetings, use the tool result directly
-                    print(tool_result)
-                else:
-                    print(tool_result)
+                answer = format_tool_result(tool_result)
+                print(answer)
+                if cacheable:
+                    tool_calls = [call for m in turn_messages for call in getattr(m, 'tool_calls', [])]
+                    cache.put(user_input, answer, tool_calls)
             else:
                 # Fallback to the final AI message if no tool result found
                 final_message = response["messages"][-1]
@@ -115,11 +302,11 @@ def main():
                     print(content)
                 else:
                     print("No response generated")
+
+            print(router.report(hit=False))
+            if cache:
+                print(cache.report())
                     
-        except Exception as e:
-            print(f"Error: {e}")
-            print("Please check if Ollama is running and the model is available.")
-                
         except Exception as e:
             print(f"Error: {e}")
             print("Please check if Ollama is running and the model is available.")
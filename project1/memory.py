@@ -0,0 +1,84 @@
+"""Token-budgeted conversation memory for the agent.
+
+History lives in a LangGraph checkpointer. Before every model call a
+``pre_model_hook`` checks the history against a token budget. When the
+history grows past the budget, the oldest turns are dropped (or folded into a
+running summary) until it is back under a low-water mark. Trimming in chunks
+like this means the history is only rewritten once every few turns.
+
+The system prompt is not part of the stored history. The agent prepends the
+same SystemMessage to every call, so the start of each prompt is
+byte-identical across turns and Ollama can reuse its KV cache for it.
+"""
+from langchain_core.messages import (
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    get_buffer_string,
+)
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+SUMMARY_ID = "conversation-summary"
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+LOW_WATER_RATIO = 0.75
+
+SUMMARIZE_PROMPT = """Update the running summary of a conversation between a user and an assistant.
+Keep names, numbers and tool results that may be referred to later. Reply with the summary only."""
+
+
+def split_summary(messages):
+    """Separate the running summary message (if any) from the rest of the history."""
+    if messages and isinstance(messages[0], SystemMessage) and messages[0].id == SUMMARY_ID:
+        return messages[0], messages[1:]
+    return None, messages
+
+
+def summarize(model, summary, evicted):
+    """Fold evicted messages into the running summary with one model call."""
+    previous = summary.content[len(SUMMARY_PREFIX):] if summary else "(none)"
+    response = model.invoke([
+        SystemMessage(content=SUMMARIZE_PROMPT),
+        HumanMessage(content=f"Current summary:\n{previous}\n\nNew messages:\n{get_buffer_string(evicted)}"),
+    ])
+    return SystemMessage(content=SUMMARY_PREFIX + response.content.strip(), id=SUMMARY_ID)
+
+
+def build_history_hook(max_tokens, summarizer=None):
+    """Return a pre_model_hook that keeps the stored history within max_tokens.
+
+    If a summarizer model is given, dropped turns are summarized rather than
+    discarded. The current turn is always kept, even if it alone is over
+    budget.
+    """
+    low_water = int(max_tokens * LOW_WATER_RATIO)
+
+    def pre_model_hook(state):
+        messages = state["messages"]
+        if count_tokens_approximately(messages) <= max_tokens:
+            return {"llm_input_messages": messages}
+
+        summary, history = split_summary(messages)
+        budget = low_water - (count_tokens_approximately([summary]) if summary else 0)
+        kept = trim_messages(
+            history,
+            max_tokens=max(budget, 0),
+            token_counter=count_tokens_approximately,
+            strategy="last",
+            start_on="human",
+        )
+        if not kept:
+            last_human = max(i for i, m in enumerate(history) if isinstance(m, HumanMessage))
+            kept = history[last_human:]
+
+        evicted = history[:len(history) - len(kept)]
+        if summarizer is not None and evicted:
+            summary = summarize(summarizer, summary, evicted)
+
+        trimmed = ([summary] if summary else []) + kept
+        return {
+            "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *trimmed],
+            "llm_input_messages": trimmed,
+        }
+
+    return pre_model_hook
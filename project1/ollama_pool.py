@@ -0,0 +1,265 @@
+"""Spread agent requests over several Ollama servers.
+
+EndpointPool tracks in-flight requests, latency and health per server and
+picks the least loaded healthy one. Servers that fail repeatedly are
+ejected for a while; a background thread probes every server and brings
+ejected ones back once they answer again.
+
+PooledAgent wraps one agent per server behind the agent executor interface
+(stream / invoke / ainvoke), so the REPL, streaming and batch code work
+unchanged. Conversation memory lives in the shared checkpointer, so a
+conversation can move between servers from one turn to the next.
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from ollama import ResponseError
+
+LATENCY_SMOOTHING = 0.2
+# Errors that point at the server rather than the request, so another server may succeed
+RETRYABLE = (ConnectionError, TimeoutError, httpx.TransportError, ResponseError)
+
+
+class Endpoint:
+    """One Ollama server and what the pool knows about it."""
+
+    def __init__(self, url):
+        self.url = url
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.latency = None
+        self.models = None
+        self.requests = 0
+        self.errors = 0
+
+    def available(self, now):
+        return self.ejected_until <= now
+
+    def serves(self, model):
+        # Until the first health check has listed its models, assume it has them
+        return model is None or self.models is None or model in self.models
+
+
+class EndpointPool:
+    """Least-loaded routing with health checks and ejection over several servers.
+
+    probe(url) must return the server's model names or raise. A server is
+    ejected for eject_seconds after failure_threshold consecutive failed
+    requests or probes.
+    """
+
+    def __init__(self, urls, probe, failure_threshold=3, eject_seconds=30.0, check_interval=10.0):
+        if not urls:
+            raise ValueError("at least one Ollama URL is required")
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Probe every server now, then keep probing in the background."""
+        self.check()
+        if len(self.endpoints) > 1:
+            self.thread = threading.Thread(target=self._check_loop, name="ollama-health", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _check_loop(self):
+        while not self.stopped.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        """Probe all servers concurrently; healthy ones past their ejection time are reinstated."""
+        def probe(endpoint):
+            try:
+                models = set(self.probe(endpoint.url))
+            except Exception:
+                self._record_failure(endpoint)
+                return
+            with self.lock:
+                endpoint.models = models
+                if endpoint.available(time.monotonic()):
+                    endpoint.failures = 0
+
+        threads = [threading.Thread(target=probe, args=(endpoint,), daemon=True) for endpoint in self.endpoints]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def pick(self, model=None, exclude=()):
+        """The available server with the fewest requests in flight (then the lowest latency).
+
+        If every server is ejected, the one that comes back soonest is used
+        rather than failing outright.
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude and e.serves(model)]
+            if not candidates:
+                return None
+            available = [e for e in candidates if e.available(now)]
+            if not available:
+                return min(candidates, key=lambda e: e.ejected_until)
+            # Servers that just failed are only used when nothing else is free
+            return min(available, key=lambda e: (e.failures > 0, e.in_flight, e.latency or 0.0))
+
+    def available_count(self, model=None):
+        now = time.monotonic()
+        with self.lock:
+            return sum(e.available(now) and e.serves(model) for e in self.endpoints)
+
+    @contextmanager
+    def acquire(self, model=None, exclude=()):
+        """Route one request: yields the chosen Endpoint and records how the request went."""
+        endpoint = self.pick(model, exclude)
+        if endpoint is None:
+            raise RuntimeError(f"no Ollama server in the pool serves {model}")
+        with self.lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        start = time.perf_counter()
+        try:
+            yield endpoint
+        except Exception:
+            self._record_failure(endpoint)
+            raise
+        else:
+            self._record_success(endpoint, time.perf_counter() - start)
+        finally:
+            with self.lock:
+                endpoint.in_flight -= 1
+
+    def _record_success(self, endpoint, seconds):
+        with self.lock:
+            endpoint.failures = 0
+            if endpoint.latency is None:
+                endpoint.latency = seconds
+            else:
+                endpoint.latency += LATENCY_SMOOTHING * (seconds - endpoint.latency)
+
+    def _record_failure(self, endpoint):
+        with self.lock:
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.failures >= self.failure_threshold:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+
+    def report(self):
+        now = time.monotonic()
+        lines = []
+        with self.lock:
+            for e in self.endpoints:
+                status = "up" if e.available(now) else f"ejected {e.ejected_until - now:.0f}s"
+                latency = f"{e.latency:.2f}s" if e.latency is not None else "-"
+                lines.append(f"[pool] {e.url}: {status}, {e.in_flight} in flight, {e.requests} requests,"
+                             f" {e.errors} errors, latency {latency}")
+        return "\n".join(lines)
+
+
+class PooledAgent:
+    """Agent executor facade that runs each request on the least loaded server.
+
+    agents maps each URL to an agent built for that server. A request that
+    fails with a connection or Ollama error is retried on the next server
+    (streams only until their first output). With a checkpointer the retry
+    resumes the turn from its last checkpoint instead of sending the
+    message again. With hedge_after set, ainvoke starts a second copy of a
+    request on another server once the first has taken that many seconds,
+    keeps whichever finishes first and cancels the other. Only use hedging
+    without a checkpointer (batch mode), since both copies would write to
+    the conversation.
+    """
+
+    def __init__(self, pool, agents, model=None, hedge_after=None):
+        self.pool = pool
+        self.agents = agents
+        self.model = model
+        self.hedge_after = hedge_after
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _retry_inputs(self, url, inputs):
+        # The failed attempt already checkpointed the new message; None resumes from there
+        return None if getattr(self.agents[url], "checkpointer", None) else inputs
+
+    def _can_retry(self, tried):
+        return self.pool.pick(self.model, tried) is not None
+
+    def stream(self, inputs, config=None, **kwargs):
+        tried = []
+        while True:
+            started = False
+            try:
+                with self.pool.acquire(self.model, tried) as endpoint:
+                    request = self._retry_inputs(endpoint.url, inputs) if tried else inputs
+                    tried.append(endpoint.url)
+                    for item in self.agents[endpoint.url].stream(request, config, **kwargs):
+                        started = True
+                        yield item
+                return
+            except RETRYABLE:
+                if started or not self._can_retry(tried):
+                    raise
+
+    def invoke(self, inputs, config=None, **kwargs):
+        tried = []
+        while True:
+            try:
+                with self.pool.acquire(self.model, tried) as endpoint:
+                    request = self._retry_inputs(endpoint.url, inputs) if tried else inputs
+                    tried.append(endpoint.url)
+                    return self.agents[endpoint.url].invoke(request, config, **kwargs)
+            except RETRYABLE:
+                if not self._can_retry(tried):
+                    raise
+
+    async def _ainvoke_on(self, inputs, config, chosen, exclude=(), **kwargs):
+        tried = list(exclude)
+        while True:
+            try:
+                with self.pool.acquire(self.model, tried) as endpoint:
+                    request = self._retry_inputs(endpoint.url, inputs) if len(tried) > len(exclude) else inputs
+                    tried.append(endpoint.url)
+                    chosen.append(endpoint.url)
+                    return await self.agents[endpoint.url].ainvoke(request, config, **kwargs)
+            except RETRYABLE:
+                if not self._can_retry(tried):
+                    raise
+
+    async def ainvoke(self, inputs, config=None, **kwargs):
+        chosen = []
+        first = asyncio.ensure_future(self._ainvoke_on(inputs, config, chosen, **kwargs))
+        if not self.hedge_after or self.pool.available_count(self.model) < 2:
+            return await first
+
+        done, _ = await asyncio.wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(self._ainvoke_on(inputs, config, [], exclude=set(chosen), **kwargs))
+        self.hedges += 1
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is second
+                        return task.result()
+            # Both copies failed; surface the original request's error
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
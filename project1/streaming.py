@@ -0,0 +1,118 @@
+"""Token-level streaming of agent turns with tool-call progress and timing."""
+import json
+import sys
+import time
+
+from langchain_core.messages import AIMessageChunk, ToolMessage
+
+
+class StreamStats:
+    """Timing for one streamed turn."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.last_token = None
+        self.chunks = 0
+        self.output_tokens = 0  # from Ollama's eval_count, when reported, summed over every model call
+        self.answer_tokens = 0  # the same, for only the model calls that streamed text
+        self.answer_seconds = 0.0  # time spent streaming those calls' text
+        self.call_first_token = None
+        self.call_last_token = None
+        self.tool_calls = []  # {"name": ..., "args": ...} for each call the model made
+        self.parts = []
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    @property
+    def ttft(self):
+        return None if self.first_token is None else self.first_token - self.start
+
+    @property
+    def tokens(self):
+        return self.answer_tokens or self.chunks
+
+    @property
+    def tokens_per_second(self):
+        # Tool-call generations stream no text, so neither their tokens nor their time are counted
+        if self.answer_tokens and self.answer_seconds > 0:
+            return self.answer_tokens / self.answer_seconds
+        if self.first_token is None or self.last_token == self.first_token:
+            return None
+        return self.chunks / (self.last_token - self.first_token)
+
+    def add_text(self, content):
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        if self.call_first_token is None:
+            self.call_first_token = now
+        self.last_token = self.call_last_token = now
+        self.chunks += 1
+        self.parts.append(content)
+
+    def end_model_call(self, output_tokens):
+        """Record a finished model call's eval_count, attributing it to the answer if the call streamed text"""
+        self.output_tokens += output_tokens
+        if self.call_first_token is not None:
+            self.answer_tokens += output_tokens
+            self.answer_seconds += self.call_last_token - self.call_first_token
+        self.call_first_token = self.call_last_token = None
+
+    def summary(self):
+        if self.first_token is None:
+            return f"[stream] no tokens | total {time.perf_counter() - self.start:.2f}s"
+        rate = self.tokens_per_second
+        rate = f"{rate:.1f} tok/s" if rate is not None else "n/a"
+        return (
+            f"[stream] ttft {self.ttft:.2f}s | {self.tokens} tokens ({rate})"
+            f" | total {time.perf_counter() - self.start:.2f}s"
+        )
+
+
+def stream_turn(agent_executor, inputs, config=None, out=sys.stdout):
+    """Run one agent turn, writing answer tokens to out as they are generated.
+
+    Uses LangGraph's ``stream_mode="messages"`` so tokens from the model node
+    arrive as they are produced. Tool calls and tool results are shown as
+    short progress lines between the streamed text.
+    """
+    stats = StreamStats()
+    calls_by_index = {}
+
+    for message, metadata in agent_executor.stream(inputs, config, stream_mode="messages"):
+        node = metadata.get("langgraph_node")
+
+        if isinstance(message, AIMessageChunk) and node == "agent":
+            for call in message.tool_call_chunks:
+                if call.get("name"):
+                    # A named chunk starts a new call; later chunks only append argument text
+                    calls_by_index[call.get("index")] = {"name": call["name"], "args": ""}
+                    stats.tool_calls.append(calls_by_index[call.get("index")])
+                    out.write(f"\n  ↳ calling {call['name']}...")
+                    out.flush()
+                if call.get("args") and call.get("index") in calls_by_index:
+                    calls_by_index[call.get("index")]["args"] += call["args"]
+
+            if message.content:
+                stats.add_text(message.content)
+                out.write(message.content)
+                out.flush()
+
+            # Ollama reports usage on the last chunk of each model call
+            if message.usage_metadata:
+                stats.end_model_call(message.usage_metadata.get("output_tokens", 0))
+
+        elif isinstance(message, ToolMessage) and node == "tools":
+            out.write(f"\n  ↳ {message.name} returned: {message.content}\n")
+            out.flush()
+
+    for call in stats.tool_calls:
+        try:
+            call["args"] = json.loads(call["args"]) if call["args"] else {}
+        except ValueError:
+            pass
+    out.write("\n")
+    return stats
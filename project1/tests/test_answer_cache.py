@@ -0,0 +1,55 @@
+import pytest
+
+from answer_cache import AnswerCache, numbers_in, operators_in
+
+
+class SameVector:
+    """Embeddings that call every pair of questions identical, so only the guard decides"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+@pytest.fixture
+def cache():
+    cache = AnswerCache(embeddings=SameVector())
+    cache.put("multiply 2 by 3", "6", [{"name": "calculator", "args": {"expression": "2*3"}}])
+    cache.put("what is 10 - 4", "6", [{"name": "calculator", "args": {"expression": "10 - 4"}}])
+    cache.put("say hello to john", "Hello john", [{"name": "say_hello", "args": {"name": "john"}}])
+    return cache
+
+
+@pytest.mark.parametrize("question", [
+    "divide 2 by 3",
+    "2/3",
+    "2+3",
+    "multiply -2 by 3",
+    "multiply 2 by 4",
+    "what is 10 + 4",
+    "what is -10 - 4",
+    "say hello to mike",
+])
+def test_near_duplicates_with_different_operands_or_operators_miss(cache, question):
+    assert cache.get(question) is None
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("Multiply 2 by 3?", "6"),
+    ("please multiply 2 by 3", "6"),
+    ("2 times 3", "6"),
+    ("what's 10-4", "6"),
+    ("greet john please, say hello", "Hello john"),
+])
+def test_rephrasings_hit(cache, question, answer):
+    assert cache.get(question) == answer
+
+
+def test_numbers_keep_their_sign():
+    assert numbers_in("2-3") == [2.0, 3.0]
+    assert numbers_in("-2 * -3.5") == [-2.0, -3.5]
+
+
+def test_operators_from_symbols_and_words():
+    assert operators_in("2*3") == operators_in("2 times 3") == ["*"]
+    assert operators_in("2 ** 3") == operators_in("2^3") == ["**"]
+    assert operators_in("say hello to mary-ann") == []
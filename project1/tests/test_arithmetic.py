@@ -0,0 +1,98 @@
+import pytest
+
+import arithmetic
+from arithmetic import ExpressionError, evaluate, evaluate_batch
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("1+1", 2),
+    ("2*3+4", 10),
+    ("7/2", 3.5),
+    ("7//2", 3),
+    ("-7 % 3", 2),
+    ("-(2**10)", -1024),
+    ("2**-1", 0.5),
+    ("((1+2)*(3+4))", 21),
+])
+def test_evaluate(expression, expected):
+    assert evaluate(expression) == expected
+
+
+@pytest.mark.parametrize("expression", [
+    "x + 1",
+    "abs(-1)",
+    "__import__('os').system('true')",
+    "(1).__class__",
+    "().__class__.__bases__[0].__subclasses__()",
+    "'a' * 3",
+    "True + 1",
+    "[1, 2]",
+    "1 if 1 else 2",
+    "1 < 2",
+    "lambda: 1",
+    "1j * 1j",
+    "not 1",
+])
+def test_rejects_unsupported_syntax(expression):
+    with pytest.raises(ExpressionError):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", [
+    "9**9**9",
+    "10**200",
+    "2**129",
+    "(10**60)*(10**60)",
+    "1/0",
+    "1//0",
+    "1%0",
+    "0.0**-1",
+    "(-8)**0.5",
+    "",
+    "1 +",
+    "-" * 40 + "1",
+    "1+" * 200 + "1",
+])
+def test_rejects_unsafe_or_invalid_input(expression):
+    with pytest.raises(ExpressionError):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize("expressions", [
+    [f"{i}/4 + {i}*0.5" for i in range(20)] + ["1+1", "2*3", "7/2"],
+    # Integer parts that float64 can't hold exactly must not be vectorized
+    ["(2**60+1-2**60)/1", "(2**3+1-2**3)/1"],
+    ["(10**17+1)%7/1", "(10+1)%7/1"],
+    ["(9007199254740993-9007199254740992)/1", "(3-2)/1"],
+    ["(94906267*94906267+1-94906267*94906267)/1", "(3*3+1-3*3)/1"],
+    ["-9007199254740993/1", "-3/1"],
+])
+def test_batch_matches_scalar_results(expressions):
+    assert evaluate_batch(expressions) == [evaluate(e) for e in expressions]
+
+
+@pytest.mark.skipif(arithmetic.np is None, reason="vector path needs numpy")
+@pytest.mark.parametrize("expressions", [
+    ["1/0", "1/2", "3/0"],
+    ["(-8)**0.5", "4**0.5", "(-1)**0.5"],
+    ["2.0**300", "2.0**3", "2.0**200"],
+    # The final value is in range, but the intermediate is not
+    ["(1e80*1e30)/1e50", "(1e10*1e30)/1e50", "(1e90*1e90)/1e90"],
+])
+def test_batch_errors_match_scalar_errors(expressions):
+    results = evaluate_batch(expressions)
+    for expression, result in zip(expressions, results):
+        try:
+            expected = evaluate(expression)
+        except ExpressionError as e:
+            assert isinstance(result, ExpressionError), expression
+            assert str(result) == str(e)
+        else:
+            assert result == pytest.approx(expected), expression
+
+
+def test_batch_reports_parse_errors_per_item():
+    results = evaluate_batch(["1+1", "x", "2*"])
+    assert results[0] == 2
+    assert isinstance(results[1], ExpressionError)
+    assert isinstance(results[2], ExpressionError)
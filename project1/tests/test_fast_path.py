@@ -0,0 +1,48 @@
+import pytest
+
+import arithmetic
+from fast_path import FastPathRouter, format_tool_result
+
+
+class Calculator:
+    """Stand-in for the calculator tool in main.py, which needs langchain to import"""
+    name = "calculator"
+
+    def invoke(self, args):
+        expression = args["expression"]
+        return f"The result of {expression} is {arithmetic.evaluate(expression)}"
+
+
+@pytest.mark.parametrize("user_input, expected", [
+    ("2*3+4", "10"),
+    ("7/2", "3.5"),
+    ("0.1+0.2", "0.30000000000000004"),
+    ("what is 2.5*2", "5.0"),
+    ("3 - 10", "-7"),
+    ("what is 3-10", "-7"),
+    ("3-10=", "-7"),
+    ("2*3-10", "-4"),
+    ("-1.5*4", "-6.0"),
+    ("10**20*1.0", "1e+20"),
+    ("-(10**20*1.0)", "-1e+20"),
+])
+def test_fast_path_returns_the_full_result(user_input, expected):
+    router = FastPathRouter([Calculator()])
+    assert format_tool_result(router.route(user_input)) == expected
+
+
+@pytest.mark.parametrize("user_input", [
+    "555-1234",
+    "2024-01-15",
+    "123-45-6789",
+    "(555)-123-4567",
+    "555-1234?",
+])
+def test_hyphenated_digits_fall_through(user_input):
+    router = FastPathRouter([Calculator()])
+    assert router.route(user_input) is None
+
+
+def test_other_tool_results_are_unchanged():
+    assert format_tool_result("Hello Ann, I hope you are well today!") == "Hello Ann, I hope you are well today!"
+    assert format_tool_result("The sum of 2.0 and 3.0 is 5.0") == "The sum of 2.0 and 3.0 is 5.0"
@@ -0,0 +1,191 @@
+"""Per-node latency and token instrumentation for the LangGraph agent.
+
+``AgentTracer`` is a LangChain callback handler; pass it in the run config
+(``{"callbacks": [tracer]}``) and it records a span for every agent turn,
+graph node, model call and tool call. Model spans carry Ollama's
+prompt_eval/eval counts and durations, so a slow turn can be split into
+prompt evaluation, generation, tool time and graph overhead.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+OLLAMA_FIELDS = (
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+    "load_duration",
+    "total_duration",
+)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class AgentTracer(BaseCallbackHandler):
+    """Collects spans from agent runs and writes them as JSON lines."""
+
+    def __init__(self, trace_path=None):
+        self.trace_file = open(trace_path, "a", encoding="utf-8") if trace_path else None
+        self.lock = threading.Lock()
+        self.open_spans = {}
+        self.roots = {}  # run_id -> run_id of the turn it belongs to
+        self.durations = defaultdict(list)  # "kind:name" -> seconds
+        self.counters = defaultdict(float)
+        self.turn_children = defaultdict(float)  # turn run_id -> model + tool seconds
+
+    # Span bookkeeping
+
+    def _start(self, run_id, parent_run_id, kind, name, **attributes):
+        with self.lock:
+            root = self.roots.get(parent_run_id, run_id) if parent_run_id else run_id
+            self.roots[run_id] = root
+            self.open_spans[run_id] = {
+                "kind": kind,
+                "name": name,
+                "run_id": str(run_id),
+                "turn_id": str(root),
+                "start": time.time(),
+                "_t0": time.perf_counter(),
+                **attributes,
+            }
+
+    def _end(self, run_id, error=None, **attributes):
+        with self.lock:
+            span = self.open_spans.pop(run_id, None)
+            root = self.roots.pop(run_id, None)
+            if span is None:
+                return
+            span["duration"] = time.perf_counter() - span.pop("_t0")
+            span.update(attributes)
+            if error is not None:
+                span["error"] = f"{type(error).__name__}: {error}"
+
+            self.durations[f"{span['kind']}:{span['name']}"].append(span["duration"])
+            if span["kind"] in ("model", "tool") and root is not None:
+                self.turn_children[root] += span["duration"]
+            if span["kind"] == "turn":
+                span["overhead"] = max(span["duration"] - self.turn_children.pop(run_id, 0.0), 0.0)
+                self.durations["turn:overhead"].append(span["overhead"])
+            if span["kind"] == "model":
+                for field in OLLAMA_FIELDS:
+                    if span.get(field) is not None:
+                        self.counters[field] += span[field]
+
+            if self.trace_file:
+                self.trace_file.write(json.dumps(span, default=str) + "\n")
+                self.trace_file.flush()
+
+    # Callback hooks
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "chain")
+        if parent_run_id is None:
+            self._start(run_id, None, "turn", name)
+        elif metadata and metadata.get("langgraph_node") == name:
+            self._start(run_id, parent_run_id, "node", name)
+        else:
+            # Track internal runnables for parentage only
+            with self.lock:
+                self.roots[run_id] = self.roots.get(parent_run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self.open_spans:
+            self._end(run_id)
+        else:
+            self.roots.pop(run_id, None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        if run_id in self.open_spans:
+            self._end(run_id, error=error)
+        else:
+            self.roots.pop(run_id, None)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        name = (kwargs.get("invocation_params") or {}).get("model") or kwargs.get("name") or "chat_model"
+        self._start(run_id, parent_run_id, "model", name, input_messages=sum(len(m) for m in messages))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        metadata = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata.update(generation.generation_info or {})
+                if message is not None:
+                    metadata.update(message.response_metadata or {})
+        self._end(run_id, **{field: metadata.get(field) for field in OLLAMA_FIELDS})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    # Reporting
+
+    def summary(self):
+        """Percentile table of every span type recorded so far."""
+        lines = [f"{'span':<28}{'count':>7}{'p50':>10}{'p90':>10}{'p99':>10}"]
+        with self.lock:
+            for key in sorted(self.durations):
+                values = sorted(self.durations[key])
+                p50, p90, p99 = (percentile(values, q) for q in QUANTILES)
+                lines.append(f"{key:<28}{len(values):>7}{p50:>9.3f}s{p90:>9.3f}s{p99:>9.3f}s")
+            counters = dict(self.counters)
+
+        if counters.get("prompt_eval_duration"):
+            rate = counters["prompt_eval_count"] / (counters["prompt_eval_duration"] / 1e9)
+            lines.append(f"prompt eval: {counters['prompt_eval_count']:.0f} tokens at {rate:.1f} tok/s")
+        if counters.get("eval_duration"):
+            rate = counters["eval_count"] / (counters["eval_duration"] / 1e9)
+            lines.append(f"generation:  {counters['eval_count']:.0f} tokens at {rate:.1f} tok/s")
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Render the collected metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP agent_span_seconds Duration of agent turns, graph nodes, model and tool calls.",
+            "# TYPE agent_span_seconds summary",
+        ]
+        with self.lock:
+            for key in sorted(self.durations):
+                kind, name = key.split(":", 1)
+                labels = f'kind="{kind}",name="{name}"'
+                values = sorted(self.durations[key])
+                for q in QUANTILES:
+                    lines.append(f'agent_span_seconds{{{labels},quantile="{q}"}} {percentile(values, q):.6f}')
+                lines.append(f"agent_span_seconds_sum{{{labels}}} {sum(values):.6f}")
+                lines.append(f"agent_span_seconds_count{{{labels}}} {len(values)}")
+
+            for field in OLLAMA_FIELDS:
+                metric = f"ollama_{field}_total"
+                unit = "nanoseconds" if field.endswith("duration") else "tokens"
+                lines.append(f"# HELP {metric} Sum of Ollama {field} over all model calls ({unit}).")
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters.get(field, 0):.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+
+    def close(self):
+        if self.trace_file:
+            self.trace_file.close()
+            self.trace_file = None
@@ -0,0 +1,70 @@
+"""Background model warm-up so the first question doesn't pay the model load."""
+import threading
+import time
+
+from ollama import Client
+
+
+def parse_keep_alive(value):
+    """Ollama accepts durations like '30m' or a number of seconds (-1 keeps the model loaded forever)."""
+    if value is None:
+        return None
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+class ModelWarmup:
+    """Loads a model into Ollama on a background thread.
+
+    An empty generate request makes Ollama load the model without producing
+    any tokens. It also sets the keep_alive window. Afterwards /api/ps
+    confirms the model is resident.
+    """
+
+    def __init__(self, base_url, model, keep_alive=None, on_ready=None):
+        self.client = Client(host=base_url)
+        self.model = model
+        self.keep_alive = keep_alive
+        self.on_ready = on_ready
+        self.done = threading.Event()
+        self.elapsed = None
+        self.load_duration = None
+        self.resident = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            response = self.client.generate(model=self.model, prompt="", keep_alive=self.keep_alive)
+            self.load_duration = (response.get("load_duration") or 0) / 1e9
+            self.resident = next(
+                (m for m in self.client.ps().get("models", []) if m.get("model") == self.model or m.get("name") == self.model),
+                None,
+            )
+        except Exception as e:
+            self.error = e
+        self.elapsed = time.perf_counter() - start
+        self.done.set()
+        if self.on_ready:
+            self.on_ready(self)
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def report(self):
+        if not self.done.is_set():
+            return f"[warm-up] {self.model} still loading..."
+        if self.error is not None:
+            return f"[warm-up] could not preload {self.model}: {self.error}"
+        if self.resident is None:
+            return f"[warm-up] {self.model} answered in {self.elapsed:.2f}s but is not listed as resident"
+        expires = self.resident.get("expires_at")
+        return (
+            f"[warm-up] {self.model} resident after {self.elapsed:.2f}s"
+            f" (load {self.load_duration:.2f}s, {self.resident.get('size_vram', 0) / 2**30:.1f} GiB in VRAM"
+            f", keep-alive until {expires})"
+        )
@@ -0,0 +1,217 @@
+"""Bulk resume analysis: many resumes through Ollama with a bounded worker pool
+
+Run from the command line:
+
+    uv run python bulk.py resumes/ batch.zip --model llama3.2 --role "Data Engineer" --output results.jsonl
+
+Results are appended to the JSONL output as each resume finishes. Re-running
+the same command skips resumes that already succeeded, so only failed or
+missing ones are redone.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from extraction import content_hash, extract_text
+from ollama_client import OllamaError
+from ollama_pool import make_client
+from prompts import build_prompt
+
+RESUME_EXTENSIONS = (".pdf", ".txt")
+CSV_FIELDS = ["file", "sha256", "model", "job_role", "status", "attempts", "extract_seconds", "llm_seconds",
+              "total_seconds", "prompt_eval_count", "eval_count", "error", "critique"]
+
+
+def result_key(sha256, model_name, job_role=""):
+    """Identity of one analysis: the same resume for another model or role is a different result"""
+    return f"{sha256}:{model_name}:{job_role}"
+
+
+def iter_zip(name, zip_bytes):
+    """Yield (name, bytes) for every resume inside a ZIP archive"""
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(RESUME_EXTENSIONS):
+                yield f"{name}/{info.filename}", archive.read(info)
+
+
+def iter_paths(paths):
+    """Yield (name, bytes) for resume files, directories (recursively) and ZIP archives"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in sorted(files):
+                    yield from iter_paths([os.path.join(root, filename)])
+        elif path.lower().endswith(".zip"):
+            with open(path, "rb") as f:
+                yield from iter_zip(path, f.read())
+        elif path.lower().endswith(RESUME_EXTENSIONS):
+            with open(path, "rb") as f:
+                yield path, f.read()
+
+
+def analyze_resume(client, model_name, name, file_bytes, job_role="", retries=2):
+    """Extract and critique one resume; failures are recorded in the result rather than raised
+
+    Connection problems and Ollama errors are retried with exponential
+    backoff; unreadable files are not.
+    """
+    record = {"file": name, "sha256": content_hash(file_bytes), "model": model_name, "job_role": job_role, "attempts": 0}
+    start = time.perf_counter()
+    try:
+        extract_start = time.perf_counter()
+        text = extract_text(file_bytes, name)
+        record["extract_seconds"] = round(time.perf_counter() - extract_start, 3)
+        if not text:
+            raise ValueError("no text could be extracted")
+    except Exception as e:
+        record.update(status="failed", error=f"extraction: {e}", total_seconds=round(time.perf_counter() - start, 3))
+        return record
+
+    prompt = build_prompt(text, job_role)
+    for attempt in range(1, retries + 2):
+        record["attempts"] = attempt
+        stats = {}
+        try:
+            llm_start = time.perf_counter()
+            record["critique"] = "".join(client.stream_generate(model_name, prompt, stats=stats))
+            record["llm_seconds"] = round(time.perf_counter() - llm_start, 3)
+            record["prompt_eval_count"] = stats.get("prompt_eval_count")
+            record["eval_count"] = stats.get("eval_count")
+            record["status"] = "ok"
+            record["error"] = None
+            break
+        except (requests.exceptions.RequestException, OllamaError) as e:
+            record["status"] = "failed"
+            record["error"] = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                time.sleep(2 ** (attempt - 1))
+
+    record["total_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_bulk(client, model_name, items, job_role="", workers=2, retries=2):
+    """Analyze (name, bytes) items with at most `workers` requests in flight, yielding results as they finish"""
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-analysis")
+    try:
+        futures = [pool.submit(analyze_resume, client, model_name, name, data, job_role, retries) for name, data in items]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # If the caller stops early (e.g. a Streamlit rerun), don't start the remaining items
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def load_finished(path, model_name, job_role=""):
+    """Content hashes of resumes that already succeeded for this model and role in an existing JSONL output"""
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            # Partial or foreign records can't be matched to a resume; that resume is just analyzed again
+            if not isinstance(record, dict) or not record.get("sha256"):
+                continue
+            # Records written before the model was recorded count for any model
+            if (record.get("status") == "ok" and record.get("job_role", "") == job_role
+                    and record.get("model", model_name) == model_name):
+                finished.add(record["sha256"])
+    return finished
+
+
+def end_with_newline(path):
+    """Terminate a partial last line (e.g. from an interrupted run) so appended records start on their own line"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def to_jsonl(records):
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+
+def to_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue()
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Critique many resumes with a local Ollama model")
+    parser.add_argument("paths", nargs="+", help="Resume files (PDF/TXT), directories or ZIP archives")
+    parser.add_argument("--model", default="llama3.2", help="Ollama model name")
+    parser.add_argument("--url", default="http://localhost:11434",
+                        help="URL where Ollama is running; comma-separate several to spread requests over them")
+    parser.add_argument("--role", default="", help="Job role the resumes are targeting")
+    parser.add_argument("--workers", type=positive_int, default=2, help="Maximum concurrent Ollama requests")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per resume on connection or Ollama errors")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results file (appended to; finished resumes are skipped)")
+    parser.add_argument("--csv", help="Also export all results in the output file to this CSV")
+    args = parser.parse_args()
+
+    client = make_client(args.url, pool_size=args.workers)
+    finished = load_finished(args.output, args.model, args.role)
+    items = [(name, data) for name, data in iter_paths(args.paths) if content_hash(data) not in finished]
+    print(f"{len(items)} resumes to analyze ({len(finished)} already done)")
+
+    start = time.perf_counter()
+    failed = 0
+    end_with_newline(args.output)
+    with open(args.output, "a", encoding="utf-8") as out:
+        for done, record in enumerate(run_bulk(client, args.model, items, args.role, args.workers, args.retries), start=1):
+            out.write(to_jsonl([record]))
+            out.flush()
+            failed += record["status"] != "ok"
+            print(f"[{done}/{len(items)}] {record['status']:>6} {record.get('total_seconds', 0):6.1f}s  {record['file']}"
+                  + (f"  ({record['error']})" if record.get("error") else ""))
+
+    print(f"Finished in {time.perf_counter() - start:.1f}s, {failed} failed. Re-run the same command to retry failures.")
+
+    if args.csv:
+        # The JSONL file is append-only; keep the latest result for each resume in the export
+        latest = {}
+        with open(args.output, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # e.g. a line cut short when an earlier run was interrupted
+                    print(f"Skipping unreadable line {line_number} of {args.output}")
+                    continue
+                if not isinstance(record, dict) or not record.get("sha256"):
+                    print(f"Skipping line {line_number} of {args.output}: not a result record")
+                    continue
+                latest[result_key(record["sha256"], record.get("model", ""), record.get("job_role", ""))] = record
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            f.write(to_csv(latest.values()))
+        print(f"Wrote {len(latest)} results to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
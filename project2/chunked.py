@@ -0,0 +1,270 @@
+"""Map-reduce analysis for long resumes
+
+The resume is split into sections that each fit a small context. The
+sections are critiqued concurrently with a capped output length. The short
+partial critiques are then combined into the usual five-area report. If
+there are too many notes for one report prompt, consecutive notes are first
+merged in groups, level by level, until they fit. Every request stays about
+the same size however long the document is, so per-request latency stays
+flat, and all of them use the same num_ctx so the model is never reloaded.
+"""
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ollama_client import DEFAULT_OPTIONS, NUM_CTX, estimate_tokens
+
+CHUNK_TOKENS = 1200
+SECTION_NUM_PREDICT = 300
+REPORT_NUM_PREDICT = 1200
+# Notes that fit in one report or merge prompt, leaving room for its instructions and the report itself
+MAX_NOTES_TOKENS = NUM_CTX - REPORT_NUM_PREDICT - 800
+
+# Resumes longer than this are analyzed section by section automatically
+MAX_SINGLE_PROMPT_TOKENS = 3000
+
+HEADINGS = (
+    "summary", "profile", "objective", "experience", "work experience", "professional experience",
+    "employment", "education", "skills", "technical skills", "projects", "certifications",
+    "awards", "publications", "languages", "interests", "volunteering", "references",
+)
+# A known heading in any case on its own line, or a short ALL-CAPS line
+HEADING_PATTERN = re.compile(
+    rf"^\s*(?i:{'|'.join(re.escape(h) for h in HEADINGS)})\s*:?\s*$|^\s*[A-Z][A-Z &/\-]{{2,40}}:?\s*$",
+    re.MULTILINE,
+)
+
+# The section text comes before anything role-specific so its prefix stays cacheable
+SECTION_PROMPT = """You are an expert resume reviewer. Review this part of a resume.
+
+Resume section:
+{section}
+
+Review it{role_context}. List its strengths, weaknesses and specific improvements in at most 6 short bullet points."""
+
+MERGE_PROMPT = """You are an expert resume reviewer. Consecutive parts of a resume were reviewed{role_context}; the notes for each part are below.
+
+{notes}
+
+Merge these notes into at most 8 short bullet points, keeping the most important strengths, weaknesses and specific improvements."""
+
+REPORT_PROMPT = """You are an expert resume reviewer and career counselor. A resume was reviewed section by section{role_context}; the notes for each section are below.
+
+{notes}
+
+Combine these notes into one detailed, actionable report with feedback in the following areas:
+1. Overall Structure and Format
+2. Content Quality and Relevance
+3. Skills and Experience Presentation
+4. Areas for Improvement
+5. Specific Recommendations
+
+Be constructive and specific in your feedback."""
+
+
+def plan_analysis(text, prompt, chunked=False):
+    """Decide between a single prompt and section-by-section analysis
+
+    Returns (use_chunked, options). The options also key the result cache,
+    so every entry point has to build them here to share cached analyses.
+    """
+    if chunked or estimate_tokens(text) > MAX_SINGLE_PROMPT_TOKENS:
+        return True, {**DEFAULT_OPTIONS, "mode": "chunked", "chunk_tokens": CHUNK_TOKENS,
+                      "section_num_predict": SECTION_NUM_PREDICT, "report_num_predict": REPORT_NUM_PREDICT,
+                      "max_notes_tokens": MAX_NOTES_TOKENS}
+    return False, dict(DEFAULT_OPTIONS)
+
+
+def _section_starts(text):
+    starts = [m.start() for m in HEADING_PATTERN.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return starts
+
+
+def split_sections(text):
+    """Split resume text at heading-like lines (EXPERIENCE, Education:, ...)"""
+    bounds = _section_starts(text) + [len(text)]
+    return [text[a:b].strip() for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+def _split_oversized(section, max_tokens):
+    """Break a section that is too long on its own at line boundaries"""
+    pieces, current, current_tokens = [], [], 0
+    for line in section.splitlines():
+        tokens = estimate_tokens(line)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def _iter_sections(pieces):
+    """split_sections over text arriving in pieces joined by newlines, yielding each section once it is complete
+
+    The last section of what has arrived so far may continue in the next
+    piece, so it is held back until a later heading (or the end) closes it.
+    """
+    pending = None
+    for piece in pieces:
+        pending = piece if pending is None else f"{pending}\n{piece}"
+        starts = _section_starts(pending)
+        for a, b in zip(starts, starts[1:]):
+            if pending[a:b].strip():
+                yield pending[a:b].strip()
+        # The tail from a heading (a line start) splits exactly as it would inside the whole text
+        pending = pending[starts[-1]:]
+    if pending and pending.strip():
+        yield pending.strip()
+
+
+def iter_chunks(pieces, max_tokens=CHUNK_TOKENS):
+    """Pack consecutive sections of text arriving in pieces (e.g. PDF pages) into chunks of at most max_tokens
+
+    Each chunk is yielded as soon as it is complete, so chunking keeps pace
+    with extraction. The chunks are the same as chunk_resume's for the
+    pieces joined by newlines.
+    """
+    current, current_tokens = [], 0
+    for section in _iter_sections(pieces):
+        for piece in _split_oversized(section, max_tokens):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                yield "\n\n".join(current)
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        yield "\n\n".join(current)
+
+
+def chunk_resume(text, max_tokens=CHUNK_TOKENS):
+    """Pack consecutive sections into chunks of at most max_tokens (estimated)"""
+    return list(iter_chunks([text], max_tokens))
+
+
+def split_text(pieces, max_tokens=CHUNK_TOKENS):
+    """(text, chunks) for text arriving in pieces, such as extraction.iter_text's pages
+
+    The chunks are built page by page while the rest of the document is
+    still being parsed, so they are ready when the text is.
+    """
+    received = []
+
+    def collect():
+        for piece in pieces:
+            if piece:
+                received.append(piece)
+                yield piece
+
+    chunks = list(iter_chunks(collect(), max_tokens))
+    return "\n".join(received).strip(), chunks
+
+
+def _options(num_predict):
+    # Only the output cap varies; num_ctx stays DEFAULT_OPTIONS' so the model isn't reloaded between phases
+    return {**DEFAULT_OPTIONS, "num_predict": num_predict}
+
+
+def _role_context(job_role):
+    return f" for a candidate applying as {job_role}" if job_role else ""
+
+
+def _generate(client, model_name, prompt, num_predict, cancel_event=None):
+    if cancel_event is not None and cancel_event.is_set():
+        # Don't start queued requests once the analysis has been abandoned
+        return "", {"cancelled": True}
+    result = client.generate(model_name, prompt, options=_options(num_predict), cancel_event=cancel_event)
+    return result.get("response", "").strip(), result
+
+
+def critique_section(client, model_name, chunk, job_role="", cancel_event=None):
+    """Critique one chunk with a capped output; returns (critique, response JSON)"""
+    prompt = SECTION_PROMPT.format(role_context=_role_context(job_role), section=chunk)
+    return _generate(client, model_name, prompt, SECTION_NUM_PREDICT, cancel_event)
+
+
+def merge_notes(client, model_name, notes, job_role="", cancel_event=None):
+    """Merge a group of (first, last, note) notes into one shorter note; returns (note, response JSON)"""
+    prompt = MERGE_PROMPT.format(role_context=_role_context(job_role), notes=_format_notes(notes))
+    return _generate(client, model_name, prompt, SECTION_NUM_PREDICT, cancel_event)
+
+
+def _format_notes(notes):
+    """Notes are (first, last, text): the range of sections they cover"""
+    return "\n\n".join(f"Section {first}:\n{note}" if first == last else f"Sections {first}-{last}:\n{note}"
+                       for first, last, note in notes)
+
+
+def group_notes(notes, max_tokens=MAX_NOTES_TOKENS):
+    """Pack consecutive notes into groups whose formatted notes fit max_tokens"""
+    groups, current, current_tokens = [], [], 0
+    for note in notes:
+        tokens = estimate_tokens(_format_notes([note])) + 1
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(note)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _run_all(pool, func, items, on_done=None):
+    """func(item) for every item on the pool, in order; on_done(done, total) as each finishes"""
+    results = [None] * len(items)
+    # Run each task in a copy of the caller's context so an active latency trace sees the requests
+    futures = {pool.submit(contextvars.copy_context().run, func, item): i for i, item in enumerate(items)}
+    for done, future in enumerate(as_completed(futures), start=1):
+        results[futures[future]] = future.result()
+        if on_done:
+            on_done(done, len(items))
+    return results
+
+
+def analyze_chunked(client, model_name, text, job_role="", workers=2, stats=None, on_section=None, cancel_event=None,
+                    chunks=None):
+    """Map-reduce analysis; returns a generator streaming the final report
+
+    Section critiques (the map phase) and any merges of their notes run
+    concurrently on `workers` threads before this returns, calling
+    on_section(done, total) as each section finishes. The combined report
+    (the reduce phase) is streamed by the returned generator. Setting
+    cancel_event stops whichever phase is running. chunks, if already built
+    from the text (see split_text), saves chunking it again.
+    """
+    if stats is None:
+        stats = {}
+    if chunks is None:
+        chunks = chunk_resume(text)
+    stats["sections"] = len(chunks)
+
+    responses = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="section-critique") as pool:
+        partials = _run_all(pool, lambda chunk: critique_section(client, model_name, chunk, job_role, cancel_event),
+                            chunks, on_section)
+        responses += [result for _, result in partials]
+        notes = [(i, i, critique) for i, (critique, _) in enumerate(partials, start=1)]
+
+        # Hierarchical reduce: the report prompt stays within NUM_CTX however many sections there are
+        stats["merge_levels"] = 0
+        while len(groups := group_notes(notes)) > 1 and not (cancel_event is not None and cancel_event.is_set()):
+            merged = _run_all(pool, lambda group: merge_notes(client, model_name, group, job_role, cancel_event), groups)
+            responses += [result for _, result in merged]
+            notes = [(group[0][0], group[-1][1], note) for group, (note, _) in zip(groups, merged)]
+            stats["merge_levels"] += 1
+
+    stats["section_prompt_eval_count"] = sum(r.get("prompt_eval_count", 0) for r in responses)
+    stats["section_eval_count"] = sum(r.get("eval_count", 0) for r in responses)
+    if cancel_event is not None and cancel_event.is_set():
+        stats["cancelled"] = True
+        return iter(())
+
+    prompt = REPORT_PROMPT.format(role_context=_role_context(job_role), notes=_format_notes(notes))
+    return client.stream_generate(model_name, prompt, options=_options(REPORT_NUM_PREDICT), stats=stats,
+                                  cancel_event=cancel_event)
@@ -0,0 +1,201 @@
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+from telemetry import log_event, span
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "extracted")
+MEMORY_CACHE_SIZE = 64
+
+# PDFs with at least this many pages are split across worker processes
+PARALLEL_PAGE_THRESHOLD = 16
+PAGES_PER_TASK = 8
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def content_hash(file_bytes):
+    """Key extracted text by the file's bytes, so renamed or re-uploaded copies still hit"""
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def is_pdf(filename, content_type=None):
+    return content_type == "application/pdf" or filename.lower().endswith(".pdf")
+
+
+def _extract_pages(reader, start, stop):
+    texts = []
+    for i in range(start, stop):
+        try:
+            texts.append(reader.pages[i].extract_text() or "")
+        except Exception as page_error:
+            log_event(logging.WARNING, "pdf_page_failed", page=i, error=str(page_error))
+            texts.append("")
+    return texts
+
+
+def _extract_page_range(path, start, stop):
+    """Worker process entry point: extract pages [start, stop) of the PDF at path"""
+    return _extract_pages(PyPDF2.PdfReader(path), start, stop)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned, not forked: the Streamlit and tornado servers are multi-threaded, and a forked
+            # worker could inherit a lock (e.g. logging's) that another thread was holding
+            _executor = ProcessPoolExecutor(max_workers=max(1, min(4, (os.cpu_count() or 2) - 1)),
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def iter_pdf_pages(file_bytes):
+    """Yield the text of each page, in order, as soon as it is parsed
+
+    Large PDFs are parsed in parallel across worker processes, and their
+    pages are yielded a range at a time as the ranges finish. The workers get
+    the path of a temporary copy of the PDF rather than the bytes, so the
+    file is written once instead of pickled into every task.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    page_count = len(reader.pages)
+    if page_count < PARALLEL_PAGE_THRESHOLD:
+        for i in range(page_count):
+            yield from _extract_pages(reader, i, i + 1)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(file_bytes)
+        path = f.name
+    futures = []
+    try:
+        ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+        futures = [_get_executor().submit(_extract_page_range, path, start, stop) for start, stop in ranges]
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Also reached when the consumer stops early; ranges that haven't started are dropped
+        for future in futures:
+            future.cancel()
+        os.remove(path)
+
+
+def extract_pdf_pages(file_bytes):
+    """Text of every page; large PDFs are parsed in parallel across worker processes"""
+    return list(iter_pdf_pages(file_bytes))
+
+
+def decode_text(file_bytes):
+    """Decode a text upload, falling back through common encodings"""
+    try:
+        return file_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        for encoding in ['latin1', 'cp1252', 'iso-8859-1']:
+            try:
+                return file_bytes.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        return file_bytes.decode('utf-8', errors='ignore')
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def _cache_get(key):
+    with _memory_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+
+    try:
+        with open(_cache_path(key), encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return None
+    _memory_put(key, text)
+    return text
+
+
+def _memory_put(key, text):
+    with _memory_lock:
+        _memory_cache[key] = text
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _cache_put(key, text):
+    _memory_put(key, text)
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log_event(logging.WARNING, "extraction_cache_write_failed", path=path, error=str(e))
+
+
+def extract_text(file_bytes, filename, content_type=None):
+    """Extract text from PDF or text bytes, cached in memory and on disk by content hash"""
+    key = content_hash(file_bytes)
+    cached = _cache_get(key)
+    if cached is not None:
+        log_event(logging.DEBUG, "extraction_cache_hit", file=filename, chars=len(cached))
+        return cached
+
+    if is_pdf(filename, content_type):
+        with span("pdf parse", bytes=len(file_bytes)):
+            text = "\n".join(page for page in extract_pdf_pages(file_bytes) if page).strip()
+    else:
+        with span("text decode", bytes=len(file_bytes)):
+            text = decode_text(file_bytes).strip()
+
+    log_event(logging.DEBUG, "extracted", file=filename, chars=len(text))
+    _cache_put(key, text)
+    return text
+
+
+
+def iter_text(file_bytes, filename, content_type=None):
+    """Yield the document's text incrementally: page by page for PDFs, all at once otherwise
+
+    Later stages (see chunked.split_text) can start on the first pages while
+    the rest are still being parsed. A cached document is yielded as a single
+    piece; otherwise the text is cached, as by extract_text, once the last
+    page has been parsed.
+    """
+    key = content_hash(file_bytes)
+    cached = _cache_get(key)
+    if cached is not None:
+        log_event(logging.DEBUG, "extraction_cache_hit", file=filename, chars=len(cached))
+        yield cached
+        return
+
+    if not is_pdf(filename, content_type):
+        yield extract_text(file_bytes, filename, content_type)
+        return
+
+    pages = []
+    with span("pdf parse", bytes=len(file_bytes)):
+        for page in iter_pdf_pages(file_bytes):
+            if page:
+                pages.append(page)
+                yield page
+    text = "\n".join(pages).strip()
+    log_event(logging.DEBUG, "extracted", file=filename, chars=len(text))
+    _cache_put(key, text)
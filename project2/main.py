@@ -1,44 +1,87 @@
 import streamlit as st
 import PyPDF2
-import io
 import requests
-import json
+import logging
+import time
+from extraction import content_hash, iter_text
+from prompts import build_prompt, build_resume_prefix, build_role_suffix
+from bulk import iter_zip, result_key, run_bulk, to_csv, to_jsonl
+from ollama_client import DEFAULT_OPTIONS, OllamaError, estimate_tokens, fits_context, format_stats
+from ollama_pool import make_client, with_hedge_after
+from chunked import analyze_chunked, plan_analysis, split_text
+from result_cache import ResultCache, cache_key
+from singleflight import SingleFlight
+from telemetry import configure_logging, end_trace, log_event, logger, span, start_trace
 
 def main():
+    configure_logging()
     st.set_page_config(page_title="AI Resume Critiquer", page_icon=":)", layout="centered")
     st.title("AI Resume Critiquer")
     st.markdown("Upload your resume in PDF format and get feedback on how to improve it.")
     
     # Ollama configuration
-    ollama_url = st.text_input("Ollama URL", value="http://localhost:11434", help="URL where Ollama is running")
+    ollama_url = st.text_input("Ollama URL", value="http://localhost:11434",
+                               help="URL where Ollama is running; separate several URLs with commas to spread requests over them")
+    hedge_after = None
+    if "," in ollama_url:
+        hedge_after = st.number_input("Hedge slow requests after (s)", min_value=0.0, value=0.0, step=5.0,
+                                      help="Re-send section critiques still running after this long to another server (0 = off)") or None
     
     # Get available models and let user select
     if st.button("🔄 Refresh Models"):
+        get_available_models.clear()
+        get_model_info.clear()
+        get_model_digest.clear()
         st.rerun()
     
-    models = get_available_models(ollama_url)
+    try:
+        models = get_available_models(ollama_url)
+    except OllamaError as e:
+        st.error(str(e))
+        models = []
+    except Exception as e:
+        st.error(f"Error connecting to Ollama: {e}")
+        models = []
+    
     if models:
         st.success(f"✅ Connected to Ollama! Found {len(models)} models")
         model_name = st.selectbox("Select Model", models, help="Choose from your installed models")
         
         # Show model details
-        for model in models:
-            if model == model_name:
-                model_info = get_model_info(ollama_url, model)
-                if model_info:
-                    st.info(f"📊 Model: {model} | Size: {model_info.get('size', 'Unknown')} | Modified: {model_info.get('modified_at', 'Unknown')}")
+        model_info = get_model_info(ollama_url, model_name)
+        if model_info:
+            st.info(f"📊 Model: {model_name} | Size: {model_info.get('size', 'Unknown')} | Modified: {model_info.get('modified_at', 'Unknown')}")
     else:
         st.error("❌ No models found. Please install a model first:")
         st.code("ollama pull llama3.2")
         st.code("ollama pull mistral")
         model_name = st.text_input("Or enter model name manually:", value="llama3.2")
     
+    mode = st.radio("Mode", ["Single resume", "Bulk analysis"], horizontal=True)
+    if mode == "Bulk analysis":
+        render_bulk_mode(ollama_url, model_name)
+        return
+    
     uploaded_file = st.file_uploader("Choose a PDF file", type=["pdf", "txt"])
     job_role = st.text_input("Enter the job role you are targeting (optional)")
     
+    chunked_mode = st.checkbox("✂️ Analyze section by section",
+                               help="Critique sections in parallel, then combine them. Used automatically for long resumes.")
+    section_workers = st.slider("Parallel section requests", min_value=1, max_value=8, value=2,
+                                help="Sections critiqued at once in section-by-section mode; match OLLAMA_NUM_PARALLEL on the server")
+    
+    force_refresh = st.checkbox("♻️ Force refresh", help="Ignore any cached analysis of this resume and generate a new one")
+    
+    show_latency = st.checkbox("⏱️ Show latency breakdown", help="Time each stage of the analysis (upload, parsing, prompt, Ollama)")
+    
     # Add an Analyze button
     analyze = st.button("🔍 Analyze Resume")
     
+    with st.expander("🔀 Compare across roles"):
+        roles_text = st.text_area("Target roles, one per line",
+                                  help="The resume is evaluated once and reused for every role, so each extra role is cheap")
+        compare = st.button("🔀 Compare Roles")
+    
     # Debug: Add breakpoint option
     if st.checkbox("🐛 Enable Debug Mode"):
         st.write("**Debug Info:**")
@@ -47,6 +90,16 @@ def main():
         st.write(f"- Available Models: {models}")
         st.write(f"- File uploaded: {uploaded_file.name if uploaded_file else 'None'}")
         st.write(f"- Job role: {job_role or 'Not specified'}")
+        cache_stats = get_result_cache().stats()
+        st.write(f"- Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                 f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries, {format_bytes(cache_stats['bytes'])}")
+        client = get_client(ollama_url)
+        if hasattr(client, "report"):
+            st.write("- Ollama servers:")
+            st.code(client.report())
+        flight_stats = get_single_flight().stats()
+        st.write(f"- Shared generations: {flight_stats['in_progress']} in progress, "
+                 f"{flight_stats['coalesced']} duplicate requests joined of {flight_stats['started'] + flight_stats['coalesced']}")
         
         # Add option to test connection
         if st.button("🔧 Test Model Connection"):
@@ -56,114 +109,305 @@ def main():
             else:
                 st.error("❌ Model connection test failed!")
     
+    if compare and uploaded_file:
+        roles = [role.strip() for role in roles_text.splitlines() if role.strip()]
+        if roles:
+            render_role_comparison(ollama_url, model_name, uploaded_file, roles, force_refresh)
+        else:
+            st.warning("Enter at least one job role to compare.")
+    
     if analyze and uploaded_file:
+        # Spans are only recorded while a trace is active, so the breakdown costs nothing when it is off
+        trace, token = start_trace() if show_latency else (None, None)
         try:
-            print(f"🚀 DEBUG: Starting resume analysis")
-            print(f"🚀 DEBUG: Ollama URL: {ollama_url}")
-            print(f"🚀 DEBUG: Selected model: {model_name}")
-            print(f"🚀 DEBUG: Available models: {models}")
-            
-            # Test if model exists before processing
-            if not models or model_name not in models:
-                print(f"❌ DEBUG: Model '{model_name}' not found in available models")
-                st.error(f"Model '{model_name}' not found. Available models: {', '.join(models) if models else 'None'}")
-                st.info("Install a model with: `ollama pull llama3.2` or `ollama pull mistral`")
-                st.stop()
-            
-            print(f"📁 DEBUG: Extracting text from file: {uploaded_file.name}")
-            file_content = extract_text_from_file(uploaded_file)
-            
-            if not file_content.strip():
-                print(f"❌ DEBUG: File content is empty")
-                st.error("The uploaded file is empty or could not be read.")
-                st.stop()
-            
-            print(f"📝 DEBUG: Extracted {len(file_content)} characters from file")
-            print(f"📝 DEBUG: First 200 chars: {file_content[:200]}...")
-            
-            # Create prompt for resume analysis  
-            job_context = f"The user is applying for the following job role: {job_role}" if job_role else "No specific job role mentioned."
-            
-            prompt = f"""You are an expert resume reviewer and career counselor. Please analyze the following resume and provide detailed, actionable feedback.
+            analyze_resume(ollama_url, model_name, models, uploaded_file, job_role, chunked_mode, force_refresh, hedge_after,
+                           section_workers)
+        finally:
+            if trace is not None:
+                end_trace(token)
+                render_latency_breakdown(trace)
+
+def analyze_resume(ollama_url, model_name, models, uploaded_file, job_role, chunked_mode=False, force_refresh=False,
+                   hedge_after=None, section_workers=2):
+    """Critique one uploaded resume, streaming the response or serving it from the result cache"""
+    try:
+        log_event(logging.INFO, "analysis_started", url=ollama_url, model=model_name, file=uploaded_file.name)
+        
+        # Test if model exists before processing
+        if not models or model_name not in models:
+            log_event(logging.WARNING, "model_not_found", model=model_name, available=models)
+            st.error(f"Model '{model_name}' not found. Available models: {', '.join(models) if models else 'None'}")
+            st.info("Install a model with: `ollama pull llama3.2` or `ollama pull mistral`")
+            return
+        
+        file_content, chunks = extract_and_chunk_file(uploaded_file)
+        
+        if not file_content.strip():
+            log_event(logging.WARNING, "empty_resume", file=uploaded_file.name)
+            st.error("The uploaded file is empty or could not be read.")
+            return
+        
+        # Create prompt for resume analysis  
+        with span("prompt build"):
+            prompt = build_prompt(file_content, job_role)
+        log_event(logging.DEBUG, "prompt_built", resume_chars=len(file_content), prompt_chars=len(prompt))
+        
+        st.markdown("### 📋 Resume Analysis & Feedback:")
+        
+        client = with_hedge_after(get_client(ollama_url), hedge_after)
+        use_chunked, options = plan_analysis(file_content, prompt, chunked_mode)
+        
+        # Same model weights, prompt and options: reuse the earlier analysis
+        result_cache = get_result_cache()
+        with span("result cache lookup"):
+            key = cache_key(model_name, get_model_digest(ollama_url, model_name), prompt, options)
+            cached = None if force_refresh else result_cache.get(key)
+        log_event(logging.DEBUG, "result_cache", hit=bool(cached), key=key[:12])
+        if cached:
+            st.markdown(cached["response"])
+            saved = cached["stats"].get("elapsed")
+            st.caption(f"⚡ Cached analysis from {time.strftime('%Y-%m-%d %H:%M', time.localtime(cached['created']))}"
+                       + (f" (saved ~{saved:.0f}s)" if saved else ""))
+            return
+        
+        # Any click reruns the script and leaves the generation; it stops once no session is watching
+        st.button("⏹ Stop")
+        
+        def start(stats, on_progress, cancel_event):
+            if use_chunked:
+                return analyze_chunked(client, model_name, file_content, job_role, workers=section_workers, stats=stats,
+                                       on_section=on_progress, cancel_event=cancel_event, chunks=chunks)
+            return client.stream_generate(model_name, prompt, options=options, stats=stats, cancel_event=cancel_event)
+        
+        # Identical analyses already running for another session are joined instead of generated again
+        subscription = get_single_flight().join(
+            key, start, on_complete=lambda response, stats: result_cache.put(key, model_name, response, stats))
+        if not subscription.leader:
+            st.caption("🔗 The same analysis is already running for another session; sharing its output.")
+        
+        # Render the critique as it is generated. A rerun (Stop) interrupts this with an exception;
+        # leaving the flight then cancels it if no other session is watching
+        try:
+            if use_chunked:
+                progress = st.progress(0.0, text="Reviewing sections...")
+                with span("section critiques"):
+                    while not subscription.flight.wait_started(timeout=0.5):
+                        if subscription.flight.progress:
+                            done, total = subscription.flight.progress
+                            progress.progress(done / total, text=f"Reviewed {done}/{total} sections")
+                progress.empty()
+            with span("stream and render"):
+                response = st.write_stream(subscription)
+        finally:
+            subscription.close()
+        stats = subscription.stats
+        
+        if response:
+            log_event(logging.INFO, "analysis_finished", model=model_name, response_chars=len(response),
+                      elapsed=round(stats.get("elapsed", 0), 3))
+            st.caption(f"⏱️ {format_stats(stats)}")
+        else:
+            log_event(logging.WARNING, "empty_response", model=model_name)
+            st.error("Failed to get response from Ollama. Please try again.")
 
-{job_context}
+    except OllamaError as e:
+        log_event(logging.ERROR, "ollama_error", model=model_name, error=str(e))
+        st.error(f"❌ {e}")
+    except requests.exceptions.Timeout:
+        log_event(logging.ERROR, "ollama_timeout", model=model_name)
+        st.error("Ollama stopped sending output. The model might be overloaded; please try again.")
 
-Resume Content:
-{file_content}
+    except Exception as e:
+        logger.exception("analysis_failed model=%r", model_name)
+        st.error(f"Error: {e}")
 
-Please provide feedback in the following areas:
-1. Overall Structure and Format
-2. Content Quality and Relevance
-3. Skills and Experience Presentation
-4. Areas for Improvement
-5. Specific Recommendations
+def render_latency_breakdown(trace):
+    """Table and chart of where the time went in the last analysis"""
+    rows = trace.rows()
+    if not rows:
+        return
+    st.markdown("### ⏱️ Latency breakdown")
+    st.bar_chart({row["span"]: row["seconds"] for row in rows}, horizontal=True)
+    st.dataframe(rows, use_container_width=True)
+    st.caption(f"Wall time {trace.elapsed:.2f}s. Ollama rows are the server's own timings "
+               "and overlap the measured stream span.")
 
-Be constructive and specific in your feedback."""
+def render_role_comparison(ollama_url, model_name, uploaded_file, roles, force_refresh=False):
+    """Critique one resume for several roles, reusing Ollama's cached evaluation of the resume"""
+    file_content = extract_text_from_file(uploaded_file)
+    if not file_content.strip():
+        st.error("The uploaded file is empty or could not be read.")
+        return
+    
+    prefix = build_resume_prefix(file_content)
+    prompts = [prefix + build_role_suffix(role) for role in roles]
+    # The same options for every role: a different num_ctx would reload the model and drop the cached prefix
+    options = DEFAULT_OPTIONS
+    if not all(fits_context(prompt) for prompt in prompts):
+        st.warning("This resume is too long to compare in one prompt and will be truncated by the model. "
+                   "Analyze it section by section for a complete review.")
+    
+    client = get_client(ollama_url)
+    result_cache = get_result_cache()
+    digest = get_model_digest(ollama_url, model_name)
+    rows = []
+    
+    # Roles run one after another on purpose: concurrent requests land in different
+    # Ollama slots and each would evaluate the resume from scratch
+    for role, prompt in zip(roles, prompts):
+        st.markdown(f"### 🎯 {role}")
+        key = cache_key(model_name, digest, prompt, options)
+        cached = None if force_refresh else result_cache.get(key)
+        if cached:
+            st.markdown(cached["response"])
+            rows.append({"role": role, "source": "result cache", "prompt tokens (est.)": estimate_tokens(prompt),
+                         "evaluated": 0, "prompt eval (s)": 0.0, "generation (s)": 0.0})
+            continue
+        
+        stats = {}
+        response = st.write_stream(client.stream_generate(model_name, prompt, options=options, stats=stats))
+        st.caption(f"⏱️ {format_stats(stats)}")
+        if response and not stats.get("cancelled"):
+            result_cache.put(key, model_name, response, stats)
+        rows.append({
+            "role": role,
+            "source": "ollama",
+            "prompt tokens (est.)": estimate_tokens(prompt),
+            "evaluated": stats.get("prompt_eval_count", 0),
+            "prompt eval (s)": round(stats.get("prompt_eval_duration", 0) / 1e9, 2),
+            "generation (s)": round(stats.get("eval_duration", 0) / 1e9, 2),
+        })
+    
+    st.markdown("### ⏱️ Prompt evaluation per role")
+    st.dataframe(rows, use_container_width=True)
+    generated = [row for row in rows if row["source"] == "ollama"]
+    if len(generated) > 1:
+        reused = sum(max(row["prompt tokens (est.)"] - row["evaluated"], 0) for row in generated[1:])
+        st.caption(f"Roles after the first reused about {reused} cached prompt tokens "
+                   f"instead of re-evaluating the resume ({estimate_tokens(prefix)} tokens) each time.")
 
-            print(f"🤖 DEBUG: Sending prompt to Ollama (length: {len(prompt)} chars)")
-            
-            # Show loading spinner
-            with st.spinner("Analyzing your resume..."):
-                response = query_ollama(ollama_url, model_name, prompt)
-            
-            if response:
-                print(f"✅ DEBUG: Got response from Ollama (length: {len(response)} chars)")
-                st.markdown("### 📋 Resume Analysis & Feedback:")
-                st.markdown(response)
+def render_bulk_mode(ollama_url, model_name):
+    """Critique many resumes at once with a bounded number of concurrent Ollama requests"""
+    uploads = st.file_uploader("Choose resumes (PDF, TXT, or ZIP archives of them)", type=["pdf", "txt", "zip"],
+                               accept_multiple_files=True)
+    job_role = st.text_input("Enter the job role these resumes are targeting (optional)")
+    workers = st.slider("Concurrent requests", min_value=1, max_value=8, value=2,
+                        help="Match this to OLLAMA_NUM_PARALLEL on the server")
+    
+    # Results survive reruns, so a second click only redoes failed or new resumes
+    results = st.session_state.setdefault("bulk_results", {})
+    # One table, updated live while a run is in progress and left with the final results
+    table = st.empty()
+    
+    if st.button("🚀 Analyze All", help="Resumes that already succeeded for this model and role are skipped") and uploads:
+        items = []
+        for upload in uploads:
+            if upload.name.lower().endswith(".zip"):
+                items.extend(iter_zip(upload.name, upload.getvalue()))
             else:
-                print(f"❌ DEBUG: No response from Ollama")
-                st.error("Failed to get response from Ollama. Please try again.")
+                items.append((upload.name, upload.getvalue()))
+        
+        pending = [(name, data) for name, data in items
+                   if results.get(result_key(content_hash(data), model_name, job_role), {}).get("status") != "ok"]
+        st.write(f"{len(pending)} of {len(items)} resumes to analyze")
+        
+        if pending:
+            progress = st.progress(0.0)
+            start = time.perf_counter()
+            for done, record in enumerate(run_bulk(get_client(ollama_url), model_name, pending, job_role, workers), start=1):
+                results[result_key(record["sha256"], model_name, job_role)] = record
+                elapsed = time.perf_counter() - start
+                progress.progress(done / len(pending),
+                                  text=f"{done}/{len(pending)} done in {elapsed:.0f}s | last: {record['file']} ({record.get('total_seconds', 0):.1f}s)")
+                table.dataframe(bulk_summary(results.values()), use_container_width=True)
+    
+    if results:
+        records = list(results.values())
+        table.dataframe(bulk_summary(records), use_container_width=True)
+        failed = sum(record["status"] != "ok" for record in records)
+        if failed:
+            st.warning(f"{failed} resumes failed. Click Analyze All again to retry only those.")
+        
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("⬇️ CSV", to_csv(records), file_name="resume_critiques.csv", mime="text/csv")
+        col2.download_button("⬇️ JSONL", to_jsonl(records), file_name="resume_critiques.jsonl", mime="application/jsonl")
+        if col3.button("🗑️ Clear results"):
+            results.clear()
+            st.rerun()
+        
+        for record in records:
+            if record["status"] == "ok":
+                with st.expander(f"📋 {record['file']}"):
+                    st.markdown(record["critique"])
+
+def bulk_summary(records):
+    """Per-resume status and timing rows for the bulk results table"""
+    return [
+        {
+            "file": record["file"],
+            "model": record.get("model", ""),
+            "status": record["status"],
+            "attempts": record["attempts"],
+            "extract (s)": record.get("extract_seconds"),
+            "LLM (s)": record.get("llm_seconds"),
+            "total (s)": record.get("total_seconds"),
+            "error": record.get("error") or "",
+        }
+        for record in records
+    ]
+
+@st.cache_resource
+def get_client(ollama_url):
+    """One pooled Ollama client per URL (or list of URLs), shared across reruns and sessions
+
+    Hedging is chosen per call with with_hedge_after, so changing it doesn't
+    start another pool for the same servers.
+    """
+    return make_client(ollama_url)
+
+@st.cache_resource
+def get_result_cache():
+    """Persistent analysis cache shared by all sessions"""
+    return ResultCache()
+
+@st.cache_resource
+def get_single_flight():
+    """In-progress generations shared by all sessions"""
+    return SingleFlight()
 
-        except Exception as e:
-            print(f"💥 DEBUG: Exception occurred: {e}")
-            import traceback
-            print(f"💥 DEBUG: Full traceback:\n{traceback.format_exc()}")
-            st.error(f"Error: {e}")
+@st.cache_data(ttl=60, show_spinner=False)
+def get_model_digest(ollama_url, model_name):
+    """Digest of the installed model, so re-pulled weights don't reuse old analyses"""
+    try:
+        return get_client(ollama_url).model_digests().get(model_name, "")
+    except Exception:
+        return ""
 
 def test_ollama_connection(ollama_url):
     """Test if Ollama is running and accessible"""
     try:
-        response = requests.get(f"{ollama_url}/api/tags", timeout=5)
-        return response.status_code == 200
-    except:
+        get_client(ollama_url).list_models()
+        return True
+    except Exception:
         return False
 
+@st.cache_data(ttl=60, show_spinner=False)
 def get_available_models(ollama_url):
-    """Get list of available models from Ollama"""
-    try:
-        response = requests.get(f"{ollama_url}/api/tags", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            models = []
-            for model in data.get('models', []):
-                # Get the model name, handle different formats
-                name = model.get('name', '')
-                if ':' in name:
-                    models.append(name)  # Keep full name with tag
-                else:
-                    models.append(name)
-            return sorted(models)
-        else:
-            st.error(f"Failed to get models: HTTP {response.status_code}")
-    except Exception as e:
-        st.error(f"Error connecting to Ollama: {e}")
-    return []
+    """Get list of available models from Ollama (cached for a minute; errors are not cached)"""
+    return get_client(ollama_url).list_models()
 
+@st.cache_data(ttl=600, show_spinner=False)
 def get_model_info(ollama_url, model_name):
     """Get detailed info about a specific model"""
     try:
-        payload = {"name": model_name}
-        response = requests.post(f"{ollama_url}/api/show", json=payload, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'size': format_bytes(data.get('size', 0)),
-                'modified_at': data.get('modified_at', '').split('T')[0] if data.get('modified_at') else 'Unknown',
-                'family': data.get('details', {}).get('family', 'Unknown')
-            }
-    except:
-        pass
-    return None
+        data = get_client(ollama_url).show(model_name)
+        return {
+            'size': format_bytes(data.get('size', 0)),
+            'modified_at': data.get('modified_at', '').split('T')[0] if data.get('modified_at') else 'Unknown',
+            'family': data.get('details', {}).get('family', 'Unknown')
+        }
+    except Exception:
+        return None
 
 def format_bytes(bytes_value):
     """Convert bytes to human readable format"""
@@ -178,182 +422,67 @@ def format_bytes(bytes_value):
 def query_ollama(ollama_url, model_name, prompt):
     """Send request to Ollama and get response"""
     try:
-        # Debug info
-        st.info(f"🔍 Debug: Using model '{model_name}' at {ollama_url}")
-        
-        payload = {
-            "model": model_name,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "max_tokens": 2000
-            }
-        }
-        
-        # Debug: Show payload (without full prompt)
-        debug_payload = payload.copy()
-        debug_payload['prompt'] = f"{prompt[:100]}..." if len(prompt) > 100 else prompt
-        st.code(f"Debug Payload: {json.dumps(debug_payload, indent=2)}")
-        
-        response = requests.post(
-            f"{ollama_url}/api/generate",
-            json=payload,
-            timeout=180
-        )
-        
-        # Debug: Show response details
-        st.info(f"🔍 Debug: Response Status: {response.status_code}")
-        
-        if response.status_code == 200:
-            result = response.json()
-            st.success("✅ Got successful response from Ollama!")
-            return result.get('response', 'No response field found')
-        else:
-            st.error(f"❌ Ollama API error: {response.status_code}")
-            st.error(f"Response text: {response.text}")
-            return None
+        # The client logs the request at DEBUG level (RESUME_CRITIQUER_LOG_LEVEL=DEBUG)
+        result = get_client(ollama_url).generate(model_name, prompt)
+        return result.get('response', 'No response field found')
             
     except requests.exceptions.Timeout:
+        log_event(logging.ERROR, "ollama_timeout", model=model_name)
         st.error("Request timed out. The model might be taking too long to respond.")
         return None
+    except OllamaError as e:
+        st.error(f"❌ {e}")
+        return None
     except Exception as e:
         st.error(f"Error querying Ollama: {e}")
         return None
 
 def extract_text_from_file(uploaded_file):
     """Extract text from uploaded file (PDF or TXT)"""
+    return extract_and_chunk_file(uploaded_file)[0]
+
+def extract_and_chunk_file(uploaded_file):
+    """Text of an uploaded file (PDF or TXT) and its sections for chunked analysis, ("", []) if unreadable
+
+    PDF pages are chunked as they are parsed, so the chunks are ready together with the text.
+    """
     try:
-        print(f"📁 DEBUG: Processing file: {uploaded_file.name}")
-        print(f"📁 DEBUG: File type: {uploaded_file.type}")
-        print(f"📁 DEBUG: File size: {uploaded_file.size} bytes")
-        print(f"📁 DEBUG: File object type: {type(uploaded_file)}")
-        print(f"📁 DEBUG: File object dir: {dir(uploaded_file)}")
-        
         # Check if uploaded_file is None or invalid
         if uploaded_file is None:
-            print("❌ DEBUG: uploaded_file is None")
             st.error("No file provided")
-            return ""
+            return "", []
         
-        # Try different methods to get the file content
-        file_bytes = None
+        log_event(logging.DEBUG, "upload", file=uploaded_file.name, type=uploaded_file.type, bytes=uploaded_file.size)
         
-        # Method 1: Try getvalue() if it's a BytesIO-like object
-        if hasattr(uploaded_file, 'getvalue'):
-            try:
+        # Streamlit's UploadedFile is a BytesIO; fall back to read() for other file-likes
+        with span("upload read"):
+            if hasattr(uploaded_file, 'getvalue'):
                 file_bytes = uploaded_file.getvalue()
-                print(f"📁 DEBUG: Got bytes using getvalue(): {len(file_bytes)} bytes, type: {type(file_bytes)}")
-            except Exception as e:
-                print(f"📁 DEBUG: getvalue() failed: {e}")
-        
-        # Method 2: Try read() method
-        if file_bytes is None:
-            try:
-                uploaded_file.seek(0)  # Ensure we're at the beginning
+            else:
+                uploaded_file.seek(0)
                 file_bytes = uploaded_file.read()
-                print(f"📁 DEBUG: Got bytes using read(): {len(file_bytes)} bytes, type: {type(file_bytes)}")
-                uploaded_file.seek(0)  # Reset pointer
-            except Exception as e:
-                print(f"📁 DEBUG: read() failed: {e}")
-                st.error(f"Could not read file: {e}")
-                return ""
+                uploaded_file.seek(0)
         
         # Verify we have valid data
-        if file_bytes is None or len(file_bytes) == 0:
-            print("❌ DEBUG: No file content retrieved")
+        if not file_bytes:
+            log_event(logging.WARNING, "empty_upload", file=uploaded_file.name)
             st.error("File appears to be empty or could not be read")
-            return ""
+            return "", []
         
-        # Process PDF files
-        if uploaded_file.type == "application/pdf" or uploaded_file.name.lower().endswith('.pdf'):
-            print("📄 DEBUG: Processing as PDF")
-            
-            # Ensure we have bytes for PyPDF2
-            if not isinstance(file_bytes, bytes):
-                print(f"📄 DEBUG: Converting {type(file_bytes)} to bytes")
-                try:
-                    if hasattr(file_bytes, 'encode'):
-                        file_bytes = file_bytes.encode('utf-8')
-                    else:
-                        file_bytes = bytes(file_bytes)
-                except Exception as convert_error:
-                    print(f"❌ DEBUG: Failed to convert to bytes: {convert_error}")
-                    st.error("Could not convert file content to bytes")
-                    return ""
-            
-            # Create BytesIO object from the bytes
-            try:
-                pdf_buffer = io.BytesIO(file_bytes)
-                pdf_buffer.seek(0)  # Ensure we're at the start
-                print(f"📄 DEBUG: Created BytesIO buffer with {len(file_bytes)} bytes")
-            except Exception as buffer_error:
-                print(f"❌ DEBUG: Failed to create BytesIO: {buffer_error}")
-                st.error("Could not create PDF buffer")
-                return ""
-            
-            # Create PDF reader from BytesIO
-            try:
-                pdf_reader = PyPDF2.PdfReader(pdf_buffer)
-                print(f"📄 DEBUG: Successfully created PdfReader with {len(pdf_reader.pages)} pages")
-            except Exception as pdf_error:
-                print(f"❌ DEBUG: PyPDF2.PdfReader failed: {pdf_error}")
-                st.error(f"Could not read PDF file: {pdf_error}")
-                return ""
-            
-            # Extract text from all pages
-            text = ""
-            for i, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                        print(f"📄 DEBUG: Page {i+1} extracted {len(page_text)} characters")
-                    else:
-                        print(f"📄 DEBUG: Page {i+1} - no text extracted")
-                except Exception as page_error:
-                    print(f"📄 DEBUG: Error extracting page {i+1}: {page_error}")
-                    continue
-            
-            print(f"📄 DEBUG: Total extracted text: {len(text)} characters")
-            return text.strip()
-            
-        else:
-            # Handle as text file
-            print("📄 DEBUG: Processing as text file")
-            
-            if isinstance(file_bytes, bytes):
-                try:
-                    text = file_bytes.decode("utf-8")
-                    print(f"📄 DEBUG: Successfully decoded as UTF-8")
-                except UnicodeDecodeError as decode_error:
-                    print(f"📄 DEBUG: UTF-8 decode failed: {decode_error}")
-                    # Try different encodings
-                    for encoding in ['latin1', 'cp1252', 'iso-8859-1']:
-                        try:
-                            text = file_bytes.decode(encoding)
-                            print(f"📄 DEBUG: Successfully decoded with {encoding}")
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    else:
-                        text = file_bytes.decode('utf-8', errors='ignore')
-                        print("📄 DEBUG: Decoded with error handling (some chars may be lost)")
-            else:
-                text = str(file_bytes)
-                print(f"📄 DEBUG: Converted to string directly")
-            
-            print(f"📄 DEBUG: Text file content length: {len(text)} characters")
-            return text.strip()
+        if isinstance(file_bytes, str):
+            file_bytes = file_bytes.encode('utf-8')
+        
+        # Parsed text is cached by content hash, so re-analyzing the same file skips the PDF parse
+        return split_text(iter_text(file_bytes, uploaded_file.name, uploaded_file.type))
             
+    except PyPDF2.errors.PdfReadError as pdf_error:
+        log_event(logging.WARNING, "pdf_unreadable", file=uploaded_file.name, error=str(pdf_error))
+        st.error(f"Could not read PDF file: {pdf_error}")
+        return "", []
     except Exception as e:
-        print(f"❌ DEBUG: Unexpected error in extract_text_from_file: {e}")
-        print(f"❌ DEBUG: Error type: {type(e)}")
-        import traceback
-        traceback.print_exc()  # This will print to console for VS Code debugging
+        logger.exception("extraction_failed file=%r", uploaded_file.name)
         st.error(f"Error reading file: {e}")
-        return ""
+        return "", []
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
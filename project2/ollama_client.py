@@ -0,0 +1,167 @@
+import json
+import logging
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from telemetry import log_event, record_ollama_timings, span
+
+# One context window for every request: each distinct num_ctx makes Ollama reload the model.
+# It fits the longest single-prompt analysis (see chunked.MAX_SINGLE_PROMPT_TOKENS) and every chunked request.
+NUM_CTX = 8192
+
+DEFAULT_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "num_predict": 2000,  # Ollama's output cap; "max_tokens" is not an Ollama option and was ignored
+    "num_ctx": NUM_CTX,
+}
+
+# (connect, read) timeouts; the read timeout applies between chunks, not to the whole generation
+STREAM_TIMEOUT = (5, 120)
+
+TIMING_FIELDS = ["total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration"]
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def fits_context(prompt, num_predict=DEFAULT_OPTIONS["num_predict"]):
+    """Whether the prompt plus the generated output fit in NUM_CTX without Ollama truncating the prompt"""
+    return estimate_tokens(prompt) + num_predict + 64 <= NUM_CTX
+
+
+class OllamaError(Exception):
+    """Raised when Ollama returns an error instead of a generation"""
+
+
+class OllamaClient:
+    """Thin Ollama API client that reuses pooled HTTP connections across requests
+
+    Create one per Ollama URL and share it (main.py keeps it in
+    st.cache_resource) so keep-alive connections survive Streamlit reruns.
+    """
+
+    def __init__(self, base_url, pool_size=8):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def list_models(self):
+        """Sorted names (with tags) of the installed models"""
+        response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
+        if response.status_code != 200:
+            raise OllamaError(f"Failed to get models: HTTP {response.status_code}")
+        return sorted(model.get("name", "") for model in response.json().get("models", []))
+
+    def model_digests(self):
+        """Map of model name to weights digest, which changes whenever a model is re-pulled"""
+        response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
+        if response.status_code != 200:
+            raise OllamaError(f"Failed to get models: HTTP {response.status_code}")
+        return {model.get("name", ""): model.get("digest", "") for model in response.json().get("models", [])}
+
+    def show(self, model_name):
+        """Raw /api/show details for a model"""
+        response = self.session.post(f"{self.base_url}/api/show", json={"name": model_name}, timeout=5)
+        if response.status_code != 200:
+            raise OllamaError(f"Failed to get model info: HTTP {response.status_code}")
+        return response.json()
+
+    def generate(self, model_name, prompt, options=None, cancel_event=None):
+        """Whole generation at once; returns a dict shaped like Ollama's non-streaming response
+
+        Streamed underneath, so STREAM_TIMEOUT's read timeout applies between
+        chunks rather than to the whole generation (a long critique on CPU
+        easily runs for minutes), and cancel_event can stop it. A cancelled
+        generation has "cancelled" set and the text produced so far.
+        """
+        stats = {}
+        text = "".join(self.stream_generate(model_name, prompt, options, stats, cancel_event))
+        return {**stats, "model": model_name, "response": text, "done": not stats.get("cancelled")}
+
+    def stream_generate(self, model_name, prompt, options=None, stats=None, cancel_event=None):
+        """Stream a generation from Ollama, yielding text as each NDJSON chunk arrives
+
+        Timing fields from the final chunk (plus the measured time to first token)
+        are written into the stats dict if one is given. Setting cancel_event, or
+        closing the generator, closes the connection, which stops the generation
+        on the Ollama side.
+        """
+        payload = {
+            "model": model_name,
+            "prompt": prompt,
+            "stream": True,
+            "options": options if options is not None else DEFAULT_OPTIONS
+        }
+        if stats is None:
+            stats = {}
+
+        log_event(logging.DEBUG, "stream_generate", model=model_name, prompt_chars=len(prompt), options=payload["options"])
+        start = time.perf_counter()
+        try:
+            # Time until the response headers arrive: connection setup plus Ollama queueing
+            with span("http request", model=model_name, stream=True):
+                response = self.session.post(f"{self.base_url}/api/generate", json=payload, stream=True, timeout=STREAM_TIMEOUT)
+            with response:
+                if response.status_code != 200:
+                    log_event(logging.ERROR, "ollama_error", model=model_name, status=response.status_code)
+                    raise OllamaError(f"Ollama API error {response.status_code}: {response.text}")
+
+                for line in response.iter_lines():
+                    if cancel_event is not None and cancel_event.is_set():
+                        stats["cancelled"] = True
+                        return
+                    if not line:
+                        continue
+
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise OllamaError(chunk["error"])
+
+                    text = chunk.get("response")
+                    if text:
+                        if "ttft" not in stats:
+                            stats["ttft"] = time.perf_counter() - start
+                        yield text
+
+                    if chunk.get("done"):
+                        for field in TIMING_FIELDS:
+                            if field in chunk:
+                                stats[field] = chunk[field]
+                        if "context" in chunk:
+                            stats["context"] = chunk["context"]
+                        record_ollama_timings(chunk)
+                        break
+        finally:
+            stats["elapsed"] = time.perf_counter() - start
+            log_event(logging.INFO, "generation_finished", model=model_name, elapsed=round(stats["elapsed"], 3),
+                      prompt_eval_count=stats.get("prompt_eval_count"), eval_count=stats.get("eval_count"),
+                      cancelled=stats.get("cancelled", False))
+
+
+def format_stats(stats):
+    """One-line summary of the timing stats collected by stream_ollama"""
+    parts = []
+    if stats.get("sections"):
+        parts.append(f"{stats['sections']} sections ({stats.get('section_prompt_eval_count', 0)} prompt tokens)")
+    if "ttft" in stats:
+        parts.append(f"first token {stats['ttft']:.1f}s")
+    if stats.get("load_duration"):
+        parts.append(f"load {stats['load_duration'] / 1e9:.1f}s")
+    if stats.get("prompt_eval_duration"):
+        rate = stats.get("prompt_eval_count", 0) / (stats["prompt_eval_duration"] / 1e9)
+        parts.append(f"prompt eval {stats['prompt_eval_duration'] / 1e9:.1f}s ({stats.get('prompt_eval_count', 0)} tokens, {rate:.0f} tok/s)")
+    if stats.get("eval_duration"):
+        rate = stats.get("eval_count", 0) / (stats["eval_duration"] / 1e9)
+        parts.append(f"generation {stats['eval_duration'] / 1e9:.1f}s ({stats.get('eval_count', 0)} tokens, {rate:.1f} tok/s)")
+    if "elapsed" in stats:
+        parts.append(f"total {stats['elapsed']:.1f}s")
+    if stats.get("cancelled"):
+        parts.append("cancelled")
+    return " | ".join(parts)
@@ -0,0 +1,346 @@
+"""Spread Ollama requests over several servers
+
+EndpointPool tracks in-flight requests, latency and health per server and
+picks the least loaded healthy one. Servers that fail repeatedly are
+ejected for a while. A background thread probes every server and brings
+ejected ones back once they answer again.
+
+OllamaPool has the same methods as OllamaClient, so the Streamlit app, bulk
+mode and the HTTP API take a comma-separated list of URLs without other
+changes (see make_client).
+"""
+import copy
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from ollama_client import OllamaClient, OllamaError
+
+LATENCY_SMOOTHING = 0.2
+
+
+class Endpoint:
+    """One Ollama server and what the pool knows about it"""
+
+    def __init__(self, url):
+        self.url = url
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.latency = None
+        self.models = None
+        self.requests = 0
+        self.errors = 0
+
+    def available(self, now):
+        return self.ejected_until <= now
+
+    def serves(self, model):
+        # Until the first health check has listed its models, assume it has them
+        return model is None or self.models is None or model in self.models
+
+
+class EndpointPool:
+    """Least-loaded routing with health checks and ejection over several servers
+
+    probe(url) must return the server's model names or raise. A server is
+    ejected for eject_seconds after failure_threshold consecutive failed
+    requests or probes.
+    """
+
+    def __init__(self, urls, probe, failure_threshold=3, eject_seconds=30.0, check_interval=10.0):
+        if not urls:
+            raise ValueError("at least one Ollama URL is required")
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Probe every server now, then keep probing in the background"""
+        self.check()
+        if len(self.endpoints) > 1:
+            self.thread = threading.Thread(target=self._check_loop, name="ollama-health", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _check_loop(self):
+        while not self.stopped.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        """Probe all servers concurrently; healthy ones past their ejection time are reinstated"""
+        def probe(endpoint):
+            try:
+                models = set(self.probe(endpoint.url))
+            except Exception:
+                self._record_failure(endpoint)
+                return
+            with self.lock:
+                endpoint.models = models
+                if endpoint.available(time.monotonic()):
+                    endpoint.failures = 0
+
+        threads = [threading.Thread(target=probe, args=(endpoint,), daemon=True) for endpoint in self.endpoints]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def pick(self, model=None, exclude=()):
+        """The available server with the fewest requests in flight (then the lowest latency)
+
+        If every server is ejected, the one that comes back soonest is used
+        rather than failing outright.
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude and e.serves(model)]
+            if not candidates:
+                return None
+            available = [e for e in candidates if e.available(now)]
+            if not available:
+                return min(candidates, key=lambda e: e.ejected_until)
+            # Servers that just failed are only used when nothing else is free
+            return min(available, key=lambda e: (e.failures > 0, e.in_flight, e.latency or 0.0))
+
+    def available_count(self, model=None):
+        now = time.monotonic()
+        with self.lock:
+            return sum(e.available(now) and e.serves(model) for e in self.endpoints)
+
+    @contextmanager
+    def acquire(self, model=None, exclude=()):
+        """Route one request: yields the chosen Endpoint and records how the request went"""
+        endpoint = self.pick(model, exclude)
+        if endpoint is None:
+            raise RuntimeError(f"no Ollama server in the pool serves {model}")
+        with self.lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        start = time.perf_counter()
+        try:
+            yield endpoint
+        except Exception:
+            self._record_failure(endpoint)
+            raise
+        else:
+            self._record_success(endpoint, time.perf_counter() - start)
+        finally:
+            with self.lock:
+                endpoint.in_flight -= 1
+
+    def _record_success(self, endpoint, seconds):
+        with self.lock:
+            endpoint.failures = 0
+            if endpoint.latency is None:
+                endpoint.latency = seconds
+            else:
+                endpoint.latency += LATENCY_SMOOTHING * (seconds - endpoint.latency)
+
+    def _record_failure(self, endpoint):
+        with self.lock:
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.failures >= self.failure_threshold:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+
+    def report(self):
+        now = time.monotonic()
+        lines = []
+        with self.lock:
+            for e in self.endpoints:
+                status = "up" if e.available(now) else f"ejected {e.ejected_until - now:.0f}s"
+                latency = f"{e.latency:.2f}s" if e.latency is not None else "-"
+                lines.append(f"{e.url}: {status}, {e.in_flight} in flight, {e.requests} requests,"
+                             f" {e.errors} errors, latency {latency}")
+        return "\n".join(lines)
+
+
+# Errors worth retrying on a different server
+RETRYABLE = (requests.exceptions.RequestException, OllamaError)
+
+
+class HedgeCancelled(BaseException):
+    """Ends the losing copy of a hedged request
+
+    A BaseException so the pool records it as neither a failure nor a
+    (misleadingly fast) success for that server.
+    """
+
+
+class _HedgeCancel:
+    """Cancel flag for one copy of a hedged request: set when it loses the race or when the caller cancels"""
+
+    def __init__(self, caller=None):
+        self.lost = threading.Event()
+        self.caller = caller
+
+    def is_set(self):
+        return self.lost.is_set() or (self.caller is not None and self.caller.is_set())
+
+
+class OllamaPool:
+    """OllamaClient-compatible client that routes each request to the least loaded server
+
+    Requests that fail before producing output are retried once on another
+    server. With hedge_after set, a non-streaming generation that is still
+    running after that many seconds is also started on a second server.
+    Whichever finishes first is used and the other is cancelled.
+    """
+
+    def __init__(self, urls, pool_size=8, hedge_after=None, **pool_options):
+        self.clients = {url: OllamaClient(url, pool_size=pool_size) for url in urls}
+        self.pool = EndpointPool(list(self.clients), probe=lambda url: self.clients[url].list_models(), **pool_options).start()
+        self.hedge_after = hedge_after
+        self.executor = ThreadPoolExecutor(max_workers=2 * pool_size, thread_name_prefix="ollama-hedge")
+        # Shared with the views from with_hedge_after, so report() covers every request
+        self.hedge_counts = Counter()
+
+    @property
+    def base_url(self):
+        return ", ".join(self.clients)
+
+    def _available_clients(self):
+        now = time.monotonic()
+        return [self.clients[e.url] for e in self.pool.endpoints if e.available(now)]
+
+    def list_models(self):
+        """Sorted names of the models installed on any reachable server"""
+        models = set()
+        with self.pool.lock:
+            for endpoint in self.pool.endpoints:
+                if endpoint.available(time.monotonic()) and endpoint.models:
+                    models |= endpoint.models
+        if not models:
+            # Nothing known yet (or everything ejected): ask the servers directly
+            models = set(self._call(None, lambda client: client.list_models()))
+        return sorted(models)
+
+    def model_digests(self):
+        digests = {}
+        errors = []
+        for client in self._available_clients():
+            try:
+                for name, digest in client.model_digests().items():
+                    digests.setdefault(name, digest)
+            except RETRYABLE as e:
+                errors.append(e)
+        if not digests and errors:
+            raise errors[0]
+        return digests
+
+    def show(self, model_name):
+        return self._call(model_name, lambda client: client.show(model_name))
+
+    def _call(self, model_name, request, attempts=2):
+        """Run request(client) on the least loaded server, failing over on connection or Ollama errors"""
+        tried = set()
+        last_error = None
+        for _ in range(min(attempts, len(self.clients))):
+            try:
+                with self.pool.acquire(model_name, exclude=tried) as endpoint:
+                    tried.add(endpoint.url)
+                    return request(self.clients[endpoint.url])
+            except RETRYABLE as e:
+                last_error = e
+        raise last_error
+
+    def generate(self, model_name, prompt, options=None, cancel_event=None):
+        if self.hedge_after and self.pool.available_count(model_name) > 1:
+            return self._hedged_generate(model_name, prompt, options, cancel_event)
+        return self._call(model_name, lambda client: client.generate(model_name, prompt, options=options,
+                                                                     cancel_event=cancel_event))
+
+    def _generate_on(self, model_name, prompt, options, cancel, chosen, exclude=()):
+        """One copy of a hedged generation, streamed so the loser can be stopped"""
+        with self.pool.acquire(model_name, exclude=exclude) as endpoint:
+            chosen.append(endpoint.url)
+            result = self.clients[endpoint.url].generate(model_name, prompt, options, cancel)
+            if cancel.lost.is_set():
+                raise HedgeCancelled()
+        return {**result, "endpoint": endpoint.url}
+
+    def _hedged_generate(self, model_name, prompt, options, cancel_event=None):
+        chosen = []
+        cancels = {}
+        first_cancel = _HedgeCancel(cancel_event)
+        first = self.executor.submit(self._generate_on, model_name, prompt, options, first_cancel, chosen)
+        cancels[first] = first_cancel
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done or (cancel_event is not None and cancel_event.is_set()):
+            return first.result()
+
+        second_cancel = _HedgeCancel(cancel_event)
+        second = self.executor.submit(self._generate_on, model_name, prompt, options, second_cancel, [], set(chosen))
+        cancels[second] = second_cancel
+        self.hedge_counts["hedges"] += 1
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        cancels[other].lost.set()
+                    self.hedge_counts["wins"] += future is second
+                    return future.result()
+        # Both copies failed; surface the original request's error
+        return first.result()
+
+    def stream_generate(self, model_name, prompt, options=None, stats=None, cancel_event=None):
+        """Stream from the least loaded server, failing over if it errors before any output"""
+        if stats is None:
+            stats = {}
+        tried = set()
+        while True:
+            started = False
+            try:
+                with self.pool.acquire(model_name, exclude=tried) as endpoint:
+                    tried.add(endpoint.url)
+                    stats["endpoint"] = endpoint.url
+                    for text in self.clients[endpoint.url].stream_generate(model_name, prompt, options, stats, cancel_event):
+                        started = True
+                        yield text
+                return
+            except RETRYABLE:
+                if started or len(tried) >= len(self.clients):
+                    raise
+
+    def report(self):
+        lines = self.pool.report()
+        if self.hedge_after or self.hedge_counts["hedges"]:
+            lines += f"\n{self.hedge_counts['hedges']} hedged requests, {self.hedge_counts['wins']} won by the hedge"
+        return lines
+
+
+def with_hedge_after(client, hedge_after):
+    """client with a different hedging delay for the calls made through it
+
+    For a pool this is a shallow copy sharing its servers, health checks,
+    threads and counters, so one pool per set of URLs serves every setting.
+    A single-server client is returned as is.
+    """
+    if not isinstance(client, OllamaPool) or client.hedge_after == hedge_after:
+        return client
+    view = copy.copy(client)
+    view.hedge_after = hedge_after
+    return view
+
+
+def make_client(urls, pool_size=8, hedge_after=None):
+    """OllamaClient for one URL, or an OllamaPool for a comma-separated list of them"""
+    urls = [url.strip() for url in urls.split(",") if url.strip()]
+    if len(urls) == 1:
+        return OllamaClient(urls[0], pool_size=pool_size)
+    return OllamaPool(urls, pool_size=pool_size, hedge_after=hedge_after)
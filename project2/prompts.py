@@ -0,0 +1,32 @@
+# The resume comes first and the job role after it. Ollama reuses the KV cache
+# for the longest prompt prefix it has already evaluated, so with this order
+# the same resume scored against another role only costs the short role
+# suffix instead of re-evaluating the whole document.
+
+def build_resume_prefix(file_content):
+    """Role-independent start of the prompt; identical for every role so it can be cached"""
+    return f"""You are an expert resume reviewer and career counselor. Please analyze the following resume and provide detailed, actionable feedback.
+
+Resume Content:
+{file_content}
+"""
+
+def build_role_suffix(job_role=""):
+    """Role-specific end of the prompt"""
+    job_context = f"The user is applying for the following job role: {job_role}" if job_role else "No specific job role mentioned."
+    
+    return f"""
+{job_context}
+
+Please provide feedback in the following areas:
+1. Overall Structure and Format
+2. Content Quality and Relevance
+3. Skills and Experience Presentation
+4. Areas for Improvement
+5. Specific Recommendations
+
+Be constructive and specific in your feedback."""
+
+def build_prompt(file_content, job_role=""):
+    """Resume analysis prompt shared by the Streamlit app and bulk mode"""
+    return build_resume_prefix(file_content) + build_role_suffix(job_role)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results.sqlite3")
+
+
+def normalize_prompt(prompt):
+    """Ignore line-ending and trailing-whitespace differences when keying prompts"""
+    lines = prompt.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def cache_key(model_name, model_digest, prompt, options):
+    """Hash of everything that determines a generation: model (and exact weights), prompt and options"""
+    material = json.dumps({
+        "model": model_name,
+        "digest": model_digest or "",
+        "prompt": normalize_prompt(prompt),
+        "options": options or {},
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed store of finished analyses with size and age based eviction
+
+    One connection is shared between threads behind a lock, which is plenty
+    for a handful of Streamlit sessions writing a row per analysis.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=500, max_bytes=50 * 2**20, max_age=30 * 24 * 3600):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                stats TEXT,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.db.commit()
+
+    def get(self, key):
+        """Cached {"response", "stats", "created"} for key, or None"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT response, stats, created FROM results WHERE key = ? AND created >= ?",
+                (key, time.time() - self.max_age),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE results SET last_used = ?, hit_count = hit_count + 1 WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return {"response": row[0], "stats": json.loads(row[1] or "{}"), "created": row[2]}
+
+    def put(self, key, model_name, response, stats=None):
+        # The context token list can be huge and is only useful to the session that produced it
+        stats = {k: v for k, v in (stats or {}).items() if k != "context"}
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results (key, model, response, stats, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, json.dumps(stats), len(response.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+            self.db.commit()
+
+    def _evict(self, now):
+        """Drop expired rows, then least recently used ones until within the count and size limits"""
+        self.db.execute("DELETE FROM results WHERE created < ?", (now - self.max_age,))
+        count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        while count > self.max_entries or size > self.max_bytes:
+            row = self.db.execute("SELECT key, size FROM results ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self.db.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            count, size = count - 1, size - row[1]
+
+    def stats(self):
+        with self.lock:
+            count, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM results")
+            self.db.commit()
@@ -0,0 +1,375 @@
+"""Headless HTTP API for the resume critiquer
+
+Run it next to (or instead of) the Streamlit app:
+
+    uv run python server.py --port 8600 --model llama3.2 --max-in-flight 2 --max-queue 16
+
+Endpoints:
+
+    POST /v1/critique   multipart form with a "resume" file (PDF or TXT), or a JSON
+                        body {"text": ...}; optional "job_role", "model", "chunked"
+                        and "force_refresh" fields. Returns the critique as JSON.
+    GET  /health        200 when Ollama is reachable, 503 otherwise
+    GET  /metrics       request counts, queue state, cache hits and latency percentiles
+
+At most --max-in-flight generations run at once and up to --max-queue more
+requests wait for a slot. Anything beyond that is rejected immediately with
+429 and a Retry-After header, so callers back off instead of piling up
+behind a CPU-bound Ollama server; that check comes before any parsing, so
+rejected requests cost next to nothing. Cached analyses are answered without
+taking a slot. A request whose client disconnects leaves the queue, or stops
+its generation on the Ollama side.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import PyPDF2
+import requests
+import tornado.web
+
+from chunked import analyze_chunked, plan_analysis, split_text
+from extraction import iter_text
+from ollama_client import OllamaError
+from ollama_pool import make_client
+from prompts import build_prompt
+from result_cache import ResultCache, cache_key
+from telemetry import configure_logging, log_event, logger
+
+MAX_UPLOAD_BYTES = 10 * 2**20
+MODEL_LIST_TTL = 60
+
+
+def extract_and_chunk(file_bytes, filename, content_type=None):
+    """(text, chunks) of an upload, chunked page by page while the PDF is parsed"""
+    return split_text(iter_text(file_bytes, filename, content_type))
+
+
+class Overloaded(Exception):
+    """Raised when every generation slot is busy and the wait queue is full"""
+
+
+class BadRequest(Exception):
+    """Raised for requests the service cannot process (HTTP 400)"""
+
+
+class Cancelled(Exception):
+    """Raised when the client went away before its critique was finished"""
+
+
+class Cancellation:
+    """Set when the HTTP client disconnects
+
+    is_set() is checked by the generation thread between chunks (it stands
+    in for the cancel_event the Ollama client takes), and wait() wakes a
+    request that is still queued for a slot.
+    """
+
+    def __init__(self):
+        self._flag = threading.Event()
+        self._event = asyncio.Event()
+
+    def set(self):
+        self._flag.set()
+        self._event.set()
+
+    def is_set(self):
+        return self._flag.is_set()
+
+    async def wait(self):
+        await self._event.wait()
+
+
+class CritiqueService:
+    """Extraction, result caching and admission-controlled generation, independent of HTTP
+
+    The blocking pieces (PDF parsing, SQLite, the requests-based Ollama
+    client) run on a thread pool so the event loop only ever waits.
+    """
+
+    def __init__(self, client, result_cache, default_model, max_in_flight=2, max_queue=16):
+        self.client = client
+        self.result_cache = result_cache
+        self.default_model = default_model
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.slots = asyncio.Semaphore(max_in_flight)
+        # Generations hold a thread each; the extra threads keep extraction and cache lookups moving meanwhile
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight + 4, thread_name_prefix="critique")
+        self.queued = 0
+        self.in_flight = 0
+        self.counters = Counter()
+        self.latencies = deque(maxlen=1000)
+        self.started = time.time()
+        self._models = (0.0, {})
+
+    async def run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def model_digests(self):
+        """Installed models and their digests, refreshed at most once a minute"""
+        fetched, digests = self._models
+        if time.monotonic() - fetched > MODEL_LIST_TTL:
+            digests = await self.run_blocking(self.client.model_digests)
+            self._models = (time.monotonic(), digests)
+        return digests
+
+    def check_capacity(self):
+        """Raise Overloaded if every slot is busy and the wait queue is full"""
+        if self.slots.locked() and self.queued >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise Overloaded(f"{self.in_flight} generations running and {self.queued} queued")
+
+    async def acquire_slot(self, cancellation=None):
+        """Wait for a generation slot, or raise Overloaded if the queue is already full
+
+        Raises Cancelled if cancellation is set while waiting.
+        """
+        self.check_capacity()
+        self.queued += 1
+        try:
+            if cancellation is None:
+                await self.slots.acquire()
+            else:
+                acquire = asyncio.ensure_future(self.slots.acquire())
+                cancelled = asyncio.ensure_future(cancellation.wait())
+                await asyncio.wait({acquire, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+                cancelled.cancel()
+                if not acquire.done():
+                    acquire.cancel()
+                    raise Cancelled("client disconnected while queued")
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def release_slot(self):
+        self.in_flight -= 1
+        self.slots.release()
+
+    def _generate(self, model_name, text, prompt, job_role, use_chunked, options, cancellation=None, chunks=None):
+        # Streamed and joined, so the per-chunk read timeout applies instead of a limit on the whole generation
+        stats = {}
+        if use_chunked:
+            # One request at a time, so a slot stands for one Ollama generation and --max-in-flight holds
+            generation = analyze_chunked(self.client, model_name, text, job_role, workers=1, stats=stats,
+                                         cancel_event=cancellation, chunks=chunks)
+        else:
+            generation = self.client.stream_generate(model_name, prompt, options=options, stats=stats,
+                                                     cancel_event=cancellation)
+        response = "".join(generation)
+        return response, {k: v for k, v in stats.items() if k.endswith(("_count", "_duration")) or k == "sections"}
+
+    async def critique(self, text=None, file_bytes=None, filename="", content_type=None, job_role="",
+                       model_name=None, chunked=False, force_refresh=False, cancellation=None):
+        """Critique one resume given as text or file bytes; returns the response document
+
+        Raises Cancelled if cancellation is set before the critique is done;
+        nothing is cached then. Raises Overloaded before doing any work if
+        the server is already at capacity.
+        """
+        self.check_capacity()
+        start = time.perf_counter()
+        model_name = model_name or self.default_model
+        if ":" not in model_name:
+            model_name += ":latest"
+        digests = await self.model_digests()
+        if model_name not in digests:
+            raise BadRequest(f"Model '{model_name}' is not installed. Available models: {', '.join(sorted(digests)) or 'None'}")
+
+        chunks = None
+        if text is None:
+            try:
+                text, chunks = await self.run_blocking(extract_and_chunk, file_bytes, filename, content_type)
+            except PyPDF2.errors.PdfReadError as e:
+                raise BadRequest(f"Could not read PDF file: {e}")
+        if not text.strip():
+            raise BadRequest("The resume is empty or could not be read")
+
+        prompt = build_prompt(text, job_role)
+        use_chunked, options = plan_analysis(text, prompt, chunked)
+        key = cache_key(model_name, digests[model_name], prompt, options)
+        cached = None if force_refresh else await self.run_blocking(self.result_cache.get, key)
+        if cached:
+            self.counters["cache_hits"] += 1
+            return {"critique": cached["response"], "model": model_name, "job_role": job_role, "cached": True,
+                    "stats": cached["stats"], "seconds": round(time.perf_counter() - start, 3)}
+
+        await self.acquire_slot(cancellation)
+        queued_seconds = time.perf_counter() - start
+        try:
+            response, stats = await self.run_blocking(self._generate, model_name, text, prompt, job_role, use_chunked,
+                                                      options, cancellation, chunks)
+        finally:
+            self.release_slot()
+        if cancellation is not None and cancellation.is_set():
+            raise Cancelled("client disconnected during generation")
+        if not response:
+            raise OllamaError("Ollama returned an empty response")
+
+        stats["elapsed"] = time.perf_counter() - start - queued_seconds
+        await self.run_blocking(self.result_cache.put, key, model_name, response, stats)
+        self.counters["generated"] += 1
+        return {"critique": response, "model": model_name, "job_role": job_role, "cached": False,
+                "chunked": use_chunked, "stats": stats, "queued_seconds": round(queued_seconds, 3),
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    def record(self, status, seconds):
+        self.counters[f"status_{status}"] += 1
+        self.latencies.append(seconds)
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3) if latencies else None
+
+        return {
+            "uptime_seconds": round(time.time() - self.started),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "counters": dict(self.counters),
+            "latency_seconds": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99),
+                                "samples": len(latencies)},
+            "result_cache": self.result_cache.stats(),
+        }
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def write_json(self, status, document):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(document, ensure_ascii=False))
+
+
+class CritiqueHandler(BaseHandler):
+    def initialize(self, service):
+        super().initialize(service)
+        self.cancellation = Cancellation()
+
+    def on_connection_close(self):
+        self.cancellation.set()
+
+    def parse_request(self):
+        """Resume and options from a multipart upload or a JSON body"""
+        if self.request.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                body = json.loads(self.request.body or b"{}")
+            except ValueError:
+                raise BadRequest("Request body is not valid JSON")
+            if not isinstance(body.get("text"), str):
+                raise BadRequest('JSON requests need a "text" field with the resume text')
+            fields = {"text": body["text"]}
+        else:
+            uploads = self.request.files.get("resume")
+            if not uploads:
+                raise BadRequest('Upload the resume as a multipart "resume" file')
+            upload = uploads[0]
+            fields = {"file_bytes": upload["body"], "filename": upload["filename"], "content_type": upload["content_type"]}
+            body = {name: self.get_body_argument(name) for name in ("job_role", "model", "chunked", "force_refresh")
+                    if self.get_body_argument(name, None) is not None}
+
+        def flag(value):
+            return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+
+        fields.update(job_role=body.get("job_role", ""), model_name=body.get("model"),
+                      chunked=flag(body.get("chunked", False)), force_refresh=flag(body.get("force_refresh", False)))
+        return fields
+
+    async def post(self):
+        start = time.perf_counter()
+        status = 200
+        try:
+            result = await self.service.critique(**self.parse_request(), cancellation=self.cancellation)
+            self.write_json(200, result)
+        except Cancelled:
+            # Nobody is left to answer; nginx's code for a client that closed the request
+            status = 499
+            self.service.counters["cancelled"] += 1
+        except BadRequest as e:
+            status = 400
+            self.write_json(status, {"error": str(e)})
+        except Overloaded as e:
+            status = 429
+            # Roughly one generation's worth of waiting before retrying
+            self.set_header("Retry-After", "30")
+            self.write_json(status, {"error": f"Server busy: {e}"})
+        except OllamaError as e:
+            status = 502
+            self.write_json(status, {"error": str(e)})
+        except requests.exceptions.RequestException as e:
+            status = 503
+            self.write_json(status, {"error": f"Ollama is unreachable: {e}"})
+        except Exception as e:
+            status = 500
+            logger.exception("critique_failed")
+            self.write_json(status, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            seconds = time.perf_counter() - start
+            self.service.record(status, seconds)
+            log_event(logging.INFO, "critique_request", status=status, seconds=round(seconds, 3),
+                      in_flight=self.service.in_flight, queued=self.service.queued)
+
+
+class HealthHandler(BaseHandler):
+    async def get(self):
+        try:
+            models = await self.service.run_blocking(self.service.client.list_models)
+        except Exception as e:
+            self.write_json(503, {"status": "unavailable", "error": str(e)})
+            return
+        self.write_json(200, {"status": "ok", "models": models, "default_model": self.service.default_model,
+                              "in_flight": self.service.in_flight, "queued": self.service.queued})
+
+
+class MetricsHandler(BaseHandler):
+    async def get(self):
+        self.write_json(200, await self.service.run_blocking(self.service.metrics))
+
+
+def make_app(service):
+    return tornado.web.Application([
+        (r"/v1/critique", CritiqueHandler, {"service": service}),
+        (r"/health", HealthHandler, {"service": service}),
+        (r"/metrics", MetricsHandler, {"service": service}),
+    ])
+
+
+async def serve(args):
+    client = make_client(args.url, pool_size=args.max_in_flight * 2, hedge_after=args.hedge_after)
+    service = CritiqueService(client, ResultCache(), args.model, args.max_in_flight, args.max_queue)
+    app = make_app(service)
+    app.listen(args.port, address=args.host, max_body_size=MAX_UPLOAD_BYTES)
+    print(f"Resume critique API on http://{args.host}:{args.port} "
+          f"(model {args.model}, {args.max_in_flight} in flight, queue {args.max_queue})")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless resume critique API backed by a local Ollama model")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8600, help="Port to listen on")
+    parser.add_argument("--url", default="http://localhost:11434",
+                        help="URL where Ollama is running; comma-separate several to spread requests over them")
+    parser.add_argument("--hedge-after", type=float,
+                        help="With several URLs, re-send generations still running after this many seconds to another server")
+    parser.add_argument("--model", default="llama3.2", help="Default Ollama model when a request doesn't name one")
+    parser.add_argument("--max-in-flight", type=int, default=2, help="Concurrent generations; match OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--max-queue", type=int, default=16, help="Requests allowed to wait for a slot before returning 429")
+    args = parser.parse_args()
+
+    configure_logging()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
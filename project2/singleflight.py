@@ -0,0 +1,199 @@
+"""Single-flight coalescing of identical concurrent generations
+
+When several sessions ask for the same analysis (same model weights, prompt
+and options, i.e. the same result-cache key) while one is still being
+generated, they all attach to that one generation instead of starting their
+own. The generation runs on a background thread and every chunk is kept, so
+a session that joins late first replays what was already produced and then
+follows along live.
+
+The generation belongs to the flight rather than to whichever session
+started it. If that session leaves (Stop, closing the tab), the others keep
+receiving output. Once every subscriber has gone the flight's cancel event
+is set, which stops the generation in whatever phase it is in, including
+requests already sent to Ollama.
+"""
+import contextvars
+import logging
+import threading
+
+from telemetry import log_event
+
+
+class Flight:
+    """One in-progress generation and everything it has produced so far"""
+
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.stats = {}
+        self.progress = None
+        self.error = None
+        self.done = False
+        self.subscribers = 0
+        self.cancel_event = threading.Event()
+        self.cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def set_progress(self, done, total):
+        with self.cond:
+            self.progress = (done, total)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    def chunk(self, index):
+        """The index-th chunk, blocking until it exists; None once the generation has ended"""
+        with self.cond:
+            while index >= len(self.chunks) and not self.done:
+                self.cond.wait()
+            if index < len(self.chunks):
+                return self.chunks[index]
+            if self.error is not None:
+                raise self.error
+            return None
+
+    def wait_started(self, timeout):
+        """True once the first chunk exists or the generation has ended"""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.chunks or self.done, timeout)
+
+    @property
+    def text(self):
+        with self.cond:
+            return "".join(self.chunks)
+
+
+class Subscription:
+    """Iterator over a flight's output for one waiter; closing it leaves the flight"""
+
+    def __init__(self, flight, leader, registry):
+        self.flight = flight
+        self.leader = leader
+        self.registry = registry
+        self.index = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        chunk = self.flight.chunk(self.index)
+        if chunk is None:
+            self.close()
+            raise StopIteration
+        self.index += 1
+        return chunk
+
+    @property
+    def stats(self):
+        return self.flight.stats
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        with self.flight.cond:
+            self.flight.subscribers -= 1
+            last = self.flight.subscribers == 0
+        if last:
+            self.registry._abandon_if_unwatched(self.flight)
+
+    # A Streamlit rerun abandons the iterator mid-stream without closing it
+    def __del__(self):
+        self.close()
+
+
+class SingleFlight:
+    """Registry of in-progress generations keyed by request hash"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def join(self, key, start, on_complete=None):
+        """Subscribe to the generation for key, starting it if none is in progress
+
+        start(stats, on_progress, cancel_event) must return an iterable of text
+        chunks; it is only called for the first request, and must stop
+        generating once cancel_event is set. on_complete(response, stats) is
+        called once with the full text if the generation finishes normally.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight(key)
+                self.flights[key] = flight
+                self.started += 1
+            else:
+                self.coalesced += 1
+            # Counted before the generation starts so it isn't mistaken for abandoned
+            with flight.cond:
+                flight.subscribers += 1
+
+        if leader:
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run, flight, start, on_complete),
+                                      name=f"single-flight-{key[:8]}", daemon=True)
+            thread.start()
+        else:
+            log_event(logging.INFO, "single_flight_joined", key=key[:12], subscribers=flight.subscribers)
+        return Subscription(flight, leader, self)
+
+    def _abandon_if_unwatched(self, flight):
+        """Cancel the flight if nobody is subscribed, unregistering it first so no one can join it"""
+        with self.lock, flight.cond:
+            if flight.subscribers:
+                return False
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+        flight.cancel_event.set()
+        return True
+
+    def _run(self, flight, start, on_complete):
+        stream = None
+        error = None
+        try:
+            stream = start(flight.stats, flight.set_progress, flight.cancel_event)
+            for chunk in stream:
+                flight.publish(chunk)
+                if flight.cancel_event.is_set():
+                    break
+            if flight.cancel_event.is_set():
+                flight.stats["cancelled"] = True
+        except Exception as e:
+            error = e
+        finally:
+            # Closing the stream closes the HTTP response, which stops the generation in Ollama
+            if hasattr(stream, "close"):
+                stream.close()
+
+        try:
+            if error is None and on_complete and not flight.stats.get("cancelled") and flight.chunks:
+                on_complete(flight.text, flight.stats)
+        except Exception as e:
+            log_event(logging.WARNING, "single_flight_on_complete_failed", key=flight.key[:12], error=str(e))
+        finally:
+            # Results are in the result cache by now, so later requests don't need this flight
+            with self.lock:
+                if self.flights.get(flight.key) is flight:
+                    del self.flights[flight.key]
+            flight.finish(error)
+
+    def stats(self):
+        with self.lock:
+            return {"in_progress": len(self.flights), "started": self.started, "coalesced": self.coalesced}
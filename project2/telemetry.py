@@ -0,0 +1,123 @@
+"""Leveled structured logging and opt-in timing spans
+
+Logging goes through the standard ``logging`` module as ``event key=value``
+lines. The level comes from RESUME_CRITIQUER_LOG_LEVEL (default WARNING).
+``log_event`` checks the level before formatting anything, so disabled debug
+logging costs one comparison.
+
+Spans are only recorded while a trace is active (see ``start_trace``).
+Otherwise ``span()`` returns a shared no-op context manager, so the
+instrumented code paths cost nothing in normal use.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("resume_critiquer")
+
+_current_trace = contextvars.ContextVar("resume_critiquer_trace", default=None)
+
+
+def configure_logging(level=None):
+    """Attach a stderr handler once; safe to call on every Streamlit rerun"""
+    level = level or os.getenv("RESUME_CRITIQUER_LOG_LEVEL", "WARNING")
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+def log_event(level, event, **fields):
+    """Log `event key=value ...` if the level is enabled; nothing is formatted otherwise"""
+    if logger.isEnabledFor(level):
+        logger.log(level, " ".join([event] + [f"{key}={value!r}" for key, value in fields.items()]))
+
+
+class Trace:
+    """Spans recorded during one traced operation (e.g. one resume analysis)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, source="measured", **attrs):
+        with self.lock:
+            self.spans.append({"span": name, "seconds": round(seconds, 4), "source": source, **attrs})
+
+    def rows(self):
+        with self.lock:
+            return list(self.spans)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "t0")
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.t0
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add(self.name, seconds, **self.attrs)
+        log_event(logging.DEBUG, "span", name=self.name, seconds=round(seconds, 4), **self.attrs)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **attrs):
+    """Time a block as a span of the active trace; a no-op when no trace is active"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, attrs)
+
+
+def record_ollama_timings(stats):
+    """Add the durations Ollama reports in its final chunk (nanoseconds) as spans"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    for field, name in (("load_duration", "ollama load"), ("prompt_eval_duration", "ollama prompt eval"),
+                        ("eval_duration", "ollama eval")):
+        if stats.get(field):
+            count_field = field.replace("_duration", "_count")
+            attrs = {"tokens": stats[count_field]} if count_field in stats else {}
+            trace.add(name, stats[field] / 1e9, source="ollama", **attrs)
+
+
+def start_trace():
+    """Start collecting spans in the current context; returns the Trace and a token for end_trace"""
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
@@ -0,0 +1,45 @@
+import json
+
+from bulk import load_finished, result_key
+
+
+def write_records(path, lines):
+    path.write_text("".join(line if isinstance(line, str) else json.dumps(line) + "\n" for line in lines),
+                    encoding="utf-8")
+
+
+def test_only_successes_for_the_same_model_and_role_count(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_records(path, [
+        {"sha256": "ok", "model": "llama3.2", "job_role": "", "status": "ok"},
+        {"sha256": "failed", "model": "llama3.2", "job_role": "", "status": "failed"},
+        {"sha256": "other-model", "model": "mistral", "job_role": "", "status": "ok"},
+        {"sha256": "other-role", "model": "llama3.2", "job_role": "Data Engineer", "status": "ok"},
+        # Written before the model was recorded
+        {"sha256": "legacy", "job_role": "", "status": "ok"},
+    ])
+    assert load_finished(str(path), "llama3.2") == {"ok", "legacy"}
+    assert load_finished(str(path), "llama3.2", "Data Engineer") == {"other-role"}
+
+
+def test_unreadable_and_foreign_lines_are_skipped(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_records(path, [
+        {"status": "ok", "model": "llama3.2"},
+        {"sha256": "", "status": "ok"},
+        "[1, 2]\n",
+        "not json\n",
+        {"sha256": "ok", "model": "llama3.2", "status": "ok"},
+        # Cut short by an interrupted run
+        '{"sha256": "partial", "sta',
+    ])
+    assert load_finished(str(path), "llama3.2") == {"ok"}
+
+
+def test_missing_output_means_nothing_is_finished(tmp_path):
+    assert load_finished(str(tmp_path / "missing.jsonl"), "llama3.2") == set()
+
+
+def test_result_key_separates_models_and_roles():
+    keys = {result_key("abc", "llama3.2"), result_key("abc", "mistral"), result_key("abc", "llama3.2", "Designer")}
+    assert len(keys) == 3
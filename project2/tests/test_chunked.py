@@ -0,0 +1,83 @@
+import pytest
+
+from chunked import chunk_resume, group_notes, iter_chunks, split_sections, split_text
+from ollama_client import estimate_tokens
+
+RESUME = """Jane Doe
+jane@example.com
+
+SUMMARY
+Backend engineer with eight years of experience.
+
+Experience:
+Acme Corp, 2018-2024
+Built the billing pipeline.
+
+EDUCATION
+BSc Computer Science
+
+Skills
+Python, Go, SQL"""
+
+
+def test_sections_split_at_headings():
+    sections = split_sections(RESUME)
+    assert [section.splitlines()[0] for section in sections] == [
+        "Jane Doe", "SUMMARY", "Experience:", "EDUCATION", "Skills"]
+
+
+def test_small_resume_is_one_chunk_with_everything():
+    chunks = chunk_resume(RESUME)
+    assert len(chunks) == 1
+    assert all(section in chunks[0] for section in split_sections(RESUME))
+
+
+def test_chunks_respect_the_token_budget():
+    text = "\n\n".join(f"ROLE {letter}\n" + "\n".join(f"Did thing {j} at company {letter}" for j in range(40))
+                       for letter in "ABCDEFGHIJ")
+    chunks = chunk_resume(text, max_tokens=200)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+    # Nothing is lost or reordered
+    assert "".join(chunks).replace("\n", "") == "".join(split_sections(text)).replace("\n", "")
+
+
+def test_oversized_section_is_split_at_line_boundaries():
+    lines = [f"line {i} " + "word " * 20 for i in range(50)]
+    chunks = chunk_resume("EXPERIENCE\n" + "\n".join(lines), max_tokens=100)
+    assert len(chunks) > 1
+    assert all(line.strip() in "\n".join(chunks) for line in lines)
+
+
+@pytest.mark.parametrize("pages", [
+    [RESUME],
+    RESUME.split("\n\n"),
+    # A section that continues on the next page, and a heading at the top of one
+    ["SUMMARY\nBackend engineer", "with eight years.   \nStill summary", "EDUCATION\nBSc", "", "more education"],
+])
+def test_chunks_from_pages_match_chunks_from_the_whole_text(pages):
+    text, chunks = split_text(pages, max_tokens=20)
+    assert text == "\n".join(page for page in pages if page).strip()
+    assert chunks == chunk_resume(text, max_tokens=20)
+
+
+def test_chunks_are_yielded_before_the_last_page_arrives():
+    arrived = []
+
+    def pages():
+        for i, letter in enumerate("ABCDE"):
+            arrived.append(i)
+            yield f"ROLE {letter}\n" + "detail " * 40
+
+    for chunk in iter_chunks(pages(), max_tokens=100):
+        assert chunk.startswith("ROLE A")
+        break
+    # The second page closes section A, the third shows that B doesn't fit in A's chunk
+    assert arrived == [0, 1, 2]
+
+
+def test_notes_are_grouped_in_order_within_the_budget():
+    notes = [(i, i, "note " * 100) for i in range(1, 11)]
+    groups = group_notes(notes, max_tokens=300)
+    assert [note for group in groups for note in group] == notes
+    assert all(len(group) <= 3 for group in groups)
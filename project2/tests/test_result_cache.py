@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from result_cache import ResultCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "results.sqlite3"))
+
+
+def test_key_ignores_line_endings_and_trailing_whitespace():
+    options = {"num_ctx": 8192}
+    assert cache_key("m", "d", "a  \r\nb\n", options) == cache_key("m", "d", "a\nb", options)
+
+
+@pytest.mark.parametrize("other", [
+    ("m2", "d", "a\nb", {"num_ctx": 8192}),
+    ("m", "d2", "a\nb", {"num_ctx": 8192}),
+    ("m", "d", "a\nc", {"num_ctx": 8192}),
+    ("m", "d", "a\nb", {"num_ctx": 4096}),
+])
+def test_key_covers_model_weights_prompt_and_options(other):
+    assert cache_key("m", "d", "a\nb", {"num_ctx": 8192}) != cache_key(*other)
+
+
+def test_round_trip_drops_the_context_tokens(cache):
+    cache.put("k", "m", "critique", {"eval_count": 5, "context": [1, 2, 3]})
+    entry = cache.get("k")
+    assert entry["response"] == "critique"
+    assert entry["stats"] == {"eval_count": 5}
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_entries=2)
+    cache.put("a", "m", "first")
+    time.sleep(0.01)
+    cache.put("b", "m", "second")
+    time.sleep(0.01)
+    assert cache.get("a")
+    time.sleep(0.01)
+    cache.put("c", "m", "third")
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_size_limit_evicts_oldest(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_bytes=10)
+    cache.put("a", "m", "123456")
+    time.sleep(0.01)
+    cache.put("b", "m", "abcdef")
+    assert cache.get("a") is None
+    assert cache.get("b")["response"] == "abcdef"
+
+
+def test_expired_entries_are_not_served(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"), max_age=60)
+    cache.put("k", "m", "critique")
+    cache.db.execute("UPDATE results SET created = created - 120")
+    assert cache.get("k") is None
+
+
+def test_clear(cache):
+    cache.put("k", "m", "critique")
+    cache.clear()
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+import tornado.httpclient
+import tornado.httpserver
+import tornado.testing
+
+import server
+from result_cache import ResultCache
+from server import Cancellation, Cancelled, CritiqueService, Overloaded
+
+
+class FakeClient:
+    """Stands in for OllamaClient: each generation streams until `gate` is set or it is cancelled"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = 0
+        self.chunks = 0
+
+    def model_digests(self):
+        return {"m:latest": "digest"}
+
+    def stream_generate(self, model_name, prompt, options=None, stats=None, cancel_event=None):
+        self.started += 1
+        for i in range(500):
+            if cancel_event is not None and cancel_event.is_set():
+                stats["cancelled"] = True
+                return
+            if self.gate.is_set() and i >= 3:
+                break
+            self.chunks += 1
+            yield f"w{i} "
+            time.sleep(0.01)
+        stats["eval_count"] = i
+
+
+@pytest.fixture
+def client():
+    client = FakeClient()
+    yield client
+    client.gate.set()
+
+
+@pytest.fixture
+def service(client, tmp_path):
+    return CritiqueService(client, ResultCache(str(tmp_path / "results.sqlite3")), "m", max_in_flight=1, max_queue=1)
+
+
+async def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_full_server_rejects_before_parsing(service, client, monkeypatch):
+    parsed = []
+    monkeypatch.setattr(server, "extract_and_chunk", lambda *args: parsed.append(args) or ("resume", ["resume"]))
+
+    async def scenario():
+        running = asyncio.ensure_future(service.critique(text="first"))
+        queued = asyncio.ensure_future(service.critique(text="second"))
+        await wait_for(lambda: service.in_flight == 1 and service.queued == 1)
+
+        with pytest.raises(Overloaded):
+            await service.critique(file_bytes=b"%PDF-1.4", filename="resume.pdf")
+        assert parsed == []
+        assert service.counters["rejected"] == 1
+
+        client.gate.set()
+        results = await asyncio.gather(running, queued)
+        assert [result["cached"] for result in results] == [False, False]
+        assert service.in_flight == 0 and service.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_holds_at_most_max_queue(client, tmp_path):
+    service = CritiqueService(client, ResultCache(str(tmp_path / "results.sqlite3")), "m", max_in_flight=2, max_queue=3)
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(service.critique(text=f"resume {i}")) for i in range(5)]
+        await wait_for(lambda: service.in_flight == 2 and service.queued == 3)
+        assert service.metrics()["queued"] == 3
+        with pytest.raises(Overloaded):
+            await service.acquire_slot()
+        client.gate.set()
+        await asyncio.gather(*tasks)
+        assert client.started == 5
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_while_queued_leaves_the_queue(service, client):
+    async def scenario():
+        running = asyncio.ensure_future(service.critique(text="first"))
+        await wait_for(lambda: service.in_flight == 1)
+        cancellation = Cancellation()
+        queued = asyncio.ensure_future(service.critique(text="second", cancellation=cancellation))
+        await wait_for(lambda: service.queued == 1)
+
+        cancellation.set()
+        with pytest.raises(Cancelled):
+            await queued
+        assert service.queued == 0
+        client.gate.set()
+        await running
+        assert client.started == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_generation_stops_and_is_not_cached(service, client):
+    async def scenario():
+        cancellation = Cancellation()
+        task = asyncio.ensure_future(service.critique(text="resume", cancellation=cancellation))
+        await wait_for(lambda: client.chunks >= 5)
+        cancellation.set()
+        with pytest.raises(Cancelled):
+            await task
+        sent = client.chunks
+        await asyncio.sleep(0.1)
+        assert client.chunks == sent < 100
+        assert service.in_flight == 0
+
+        client.gate.set()
+        result = await service.critique(text="resume")
+        assert result["cached"] is False
+
+    asyncio.run(scenario())
+
+
+def test_chunked_generation_uses_one_worker_per_slot(service, monkeypatch):
+    calls = []
+
+    def analyze_chunked(client, model_name, text, job_role="", workers=2, stats=None, on_section=None, cancel_event=None,
+                        chunks=None):
+        calls.append(workers)
+        return iter(["report"])
+
+    monkeypatch.setattr(server, "analyze_chunked", analyze_chunked)
+    result = asyncio.run(service.critique(text="resume", chunked=True))
+    assert result["chunked"] is True
+    assert calls == [1]
+
+
+def test_http_429_and_disconnect(service, client):
+    async def scenario():
+        sock, port = tornado.testing.bind_unused_port()
+        http_server = tornado.httpserver.HTTPServer(server.make_app(service))
+        http_server.add_sockets([sock])
+        url = f"http://127.0.0.1:{port}/v1/critique"
+        http = tornado.httpclient.AsyncHTTPClient()
+
+        def post(text, timeout=10):
+            return http.fetch(url, method="POST", body=json.dumps({"text": text}), raise_error=False,
+                              headers={"Content-Type": "application/json"}, request_timeout=timeout)
+
+        # The first request hangs up mid-generation, the second waits behind it, the third is turned away
+        hangup = asyncio.ensure_future(post("first", timeout=0.5))
+        await wait_for(lambda: service.in_flight == 1)
+        queued = asyncio.ensure_future(post("second"))
+        await wait_for(lambda: service.queued == 1)
+
+        rejected = await post("third")
+        assert rejected.code == 429
+        assert rejected.headers["Retry-After"]
+
+        # Timeouts raise even with raise_error=False
+        with pytest.raises(tornado.httpclient.HTTPClientError):
+            await hangup
+        await wait_for(lambda: service.counters["cancelled"] == 1)
+        assert service.counters["status_499"] == 1
+
+        client.gate.set()
+        response = await queued
+        assert response.code == 200
+        assert json.loads(response.body)["critique"]
+        http_server.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Generation:
+    """A start() for SingleFlight whose chunks are released one at a time by the test"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+        self.released = threading.Semaphore(0)
+        self.cancel_event = None
+
+    def __call__(self, stats, on_progress, cancel_event):
+        self.calls += 1
+        self.cancel_event = cancel_event
+        return self.stream(stats)
+
+    def stream(self, stats):
+        for chunk in self.chunks:
+            self.released.acquire(timeout=5)
+            if self.cancel_event.is_set():
+                return
+            yield chunk
+        stats["eval_count"] = len(self.chunks)
+
+    def release(self, count=1):
+        for _ in range(count):
+            self.released.release()
+
+
+def test_identical_requests_share_one_generation():
+    flights = SingleFlight()
+    generation = Generation(["a", "b", "c"])
+    completed = []
+    first = flights.join("key", generation, on_complete=lambda response, stats: completed.append(response))
+    generation.release()
+    assert next(first) == "a"
+
+    # A late joiner replays what was already produced, then follows along
+    second = flights.join("key", generation)
+    generation.release(2)
+    assert "".join(second) == "abc"
+    assert "".join(first) == "bc"
+    assert first.leader and not second.leader
+    assert generation.calls == 1
+    assert completed == ["abc"]
+    assert first.stats["eval_count"] == 3
+    assert flights.stats() == {"in_progress": 0, "started": 1, "coalesced": 1}
+
+
+def test_generation_continues_while_anyone_is_watching():
+    flights = SingleFlight()
+    generation = Generation(["a", "b"])
+    first = flights.join("key", generation)
+    second = flights.join("key", generation)
+    first.close()
+    assert not generation.cancel_event.is_set()
+    generation.release(2)
+    assert "".join(second) == "ab"
+
+
+def test_last_subscriber_leaving_cancels_the_generation():
+    flights = SingleFlight()
+    generation = Generation(["a", "b", "c"])
+    completed = []
+    subscription = flights.join("key", generation, on_complete=lambda response, stats: completed.append(response))
+    generation.release()
+    assert next(subscription) == "a"
+    subscription.close()
+    assert generation.cancel_event.is_set()
+
+    # Nobody can join the cancelled flight; the next request starts its own
+    replacement = Generation(["x"])
+    rejoined = flights.join("key", replacement)
+    assert rejoined.leader and rejoined.flight is not subscription.flight
+    replacement.release()
+    assert "".join(rejoined) == "x"
+
+    generation.release(2)
+    assert subscription.flight.chunk(1) is None
+    assert subscription.flight.stats["cancelled"]
+    assert completed == []
+
+
+def test_errors_reach_every_subscriber():
+    flights = SingleFlight()
+
+    def start(stats, on_progress, cancel_event):
+        yield "a"
+        raise ValueError("model crashed")
+
+    completed = []
+    subscription = flights.join("key", start, on_complete=lambda response, stats: completed.append(response))
+    assert next(subscription) == "a"
+    with pytest.raises(ValueError, match="model crashed"):
+        next(subscription)
+    assert completed == []
@@ -0,0 +1,168 @@
+"""Inference backends: the Keras graph, or MobileNetV2 converted to TFLite
+
+The TFLite conversion runs once per quantization mode (and calibration set)
+and is cached under .cache/models, so later starts skip building the Keras
+model entirely. Converted models run on the standalone LiteRT runtime
+(ai-edge-litert, or the older tflite-runtime) when one is installed, so
+TensorFlow is only imported for the Keras backend and for conversion.
+Interpreters use the builtin op resolver, which applies the XNNPACK CPU
+delegate, with a configurable thread count.
+
+Quantization:
+    float32  plain conversion
+    dynamic  int8 weights, float activations; no calibration data needed
+    int8     int8 weights and activations, calibrated on sample images;
+             inputs and outputs stay float32, so preprocessing is unchanged
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from inference import IMAGE_SHAPE, keras_forward
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "models")
+BACKENDS = {
+    "Keras (float32)": None,
+    "TFLite (float32)": "float32",
+    "TFLite (dynamic range)": "dynamic",
+    "TFLite (int8)": "int8",
+}
+# Inputs are padded to one of these batch sizes, each with its own allocated interpreter
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+# Interpreters kept allocated at once, least recently used evicted first; each holds its bucket's activations
+MAX_INTERPRETERS = 3
+MAX_CALIBRATION_IMAGES = 200
+
+
+def artifact_path(quantization, calibration=None):
+    name = f"mobilenet_v2_{quantization}"
+    if quantization == "int8":
+        name += "_" + hashlib.sha256(calibration.tobytes()).hexdigest()[:12]
+    return os.path.join(MODEL_DIR, f"{name}.tflite")
+
+
+def convert_to_tflite(load_model, quantization="float32", calibration=None):
+    """Path of the converted model, converting (and caching) it if needed
+
+    load_model is only called on a cache miss. calibration is a preprocessed
+    (N, 224, 224, 3) batch, required for int8.
+    """
+    if quantization == "int8" and (calibration is None or not len(calibration)):
+        raise ValueError("int8 quantization needs calibration images")
+    path = artifact_path(quantization, calibration)
+    if os.path.exists(path):
+        return path
+
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(load_model())
+    if quantization in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "int8":
+        converter.representative_dataset = lambda: ([image[np.newaxis]] for image in calibration)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    tflite_model = converter.convert()
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(tflite_model)
+    os.replace(tmp_path, path)
+    return path
+
+
+def interpreter_api():
+    """(Interpreter, OpResolverType) from LiteRT or tflite-runtime if installed, else from TensorFlow"""
+    try:
+        from ai_edge_litert import interpreter
+    except ImportError:
+        try:
+            from tflite_runtime import interpreter
+        except ImportError:
+            import tensorflow as tf
+            return tf.lite.Interpreter, tf.lite.experimental.OpResolverType
+    return interpreter.Interpreter, interpreter.OpResolverType
+
+
+class TFLiteForward:
+    """Batched forward pass over a .tflite model, same interface as keras_forward"""
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.num_threads = num_threads
+        with open(path, "rb") as f:
+            # Identifies the exact weights, so predictions from another quantization or calibration never mix
+            self.digest = hashlib.file_digest(f, "sha256").hexdigest()
+        self.interpreter_class, self.op_resolver_type = interpreter_api()
+        self.interpreters = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _interpreter(self, bucket):
+        interpreter = self.interpreters.get(bucket)
+        if interpreter is None:
+            interpreter = self.interpreter_class(
+                model_path=self.path,
+                num_threads=self.num_threads,
+                # BUILTIN applies the default delegates, i.e. XNNPACK on CPU
+                experimental_op_resolver_type=self.op_resolver_type.BUILTIN,
+            )
+            interpreter.resize_tensor_input(interpreter.get_input_details()[0]["index"], [bucket, *IMAGE_SHAPE])
+            interpreter.allocate_tensors()
+            self.interpreters[bucket] = interpreter
+            while len(self.interpreters) > MAX_INTERPRETERS:
+                self.interpreters.popitem(last=False)
+        self.interpreters.move_to_end(bucket)
+        return interpreter
+
+    def __call__(self, batch):
+        outputs = []
+        with self.lock:
+            for start in range(0, len(batch), BATCH_BUCKETS[-1]):
+                chunk = batch[start:start + BATCH_BUCKETS[-1]]
+                count = len(chunk)
+                bucket = next(size for size in BATCH_BUCKETS if size >= count)
+                if bucket != count:
+                    padded = np.zeros((bucket, *IMAGE_SHAPE), dtype=np.float32)
+                    padded[:count] = chunk
+                    chunk = padded
+                interpreter = self._interpreter(bucket)
+                interpreter.set_tensor(interpreter.get_input_details()[0]["index"], np.ascontiguousarray(chunk, dtype=np.float32))
+                interpreter.invoke()
+                output = interpreter.get_tensor(interpreter.get_output_details()[0]["index"])
+                outputs.append(output[:count].copy())
+        return np.concatenate(outputs)
+
+
+def make_forward(backend, load_model, num_threads=None, calibration=None):
+    """Forward function for a BACKENDS name"""
+    quantization = BACKENDS[backend]
+    if quantization is None:
+        return keras_forward(load_model())
+    return TFLiteForward(convert_to_tflite(load_model, quantization, calibration), num_threads)
+
+
+def cache_namespace(backend, forward):
+    """Prediction cache namespace: the converted model's digest for TFLite backends, the backend name for Keras"""
+    return forward.digest if BACKENDS[backend] else backend
+
+
+def parity_check(reference, candidate, batch):
+    """Top-1 agreement and speed of candidate against reference on a preprocessed batch"""
+    def timed(forward):
+        forward(batch)  # Exclude one-off setup (tracing, interpreter allocation) from the timing
+        start = time.perf_counter()
+        probabilities = forward(batch)
+        return probabilities, (time.perf_counter() - start) / len(batch) * 1000
+
+    expected, reference_ms = timed(reference)
+    actual, candidate_ms = timed(candidate)
+    return {
+        "images": len(batch),
+        "top1_agreement": float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1))),
+        "max_probability_difference": float(np.abs(expected - actual).max()),
+        "reference_ms_per_image": reference_ms,
+        "candidate_ms_per_image": candidate_ms,
+    }
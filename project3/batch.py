@@ -0,0 +1,146 @@
+"""Batched classification of many images at once
+
+Images are decoded and preprocessed on a thread pool (see preprocessing.py),
+straight into their slot of one preallocated (N, 224, 224, 3) float32 array. The array is then submitted
+to the shared inference worker in chunks of batch_size, so the per-call
+overhead of the model is paid once per chunk rather than once per image.
+"""
+import csv
+import functools
+import io
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from prediction_cache import STORED_TOP
+from preprocessing import allocate_batch, preprocess_into
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+CSV_FIELDS = ["file", "label", "score", "label_2", "score_2", "label_3", "score_3", "error"]
+# The ImageNet class index Keras downloads on first use, bundled so labels need neither TensorFlow nor network
+CLASS_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imagenet_class_index.json")
+
+
+@functools.cache
+def class_index():
+    """[(class_id, label), ...] in model output order"""
+    with open(CLASS_INDEX_PATH, encoding="utf-8") as f:
+        index = json.load(f)
+    return [tuple(index[str(i)]) for i in range(len(index))]
+
+
+def decode_predictions(probabilities, top=5):
+    """Top predictions as [(class_id, label, score), ...] for each row of (N, classes) probabilities, like Keras'"""
+    classes = class_index()
+    best = np.argsort(probabilities, axis=1)[:, ::-1][:, :top]
+    return [[(*classes[i], float(row[i])) for i in indices] for row, indices in zip(probabilities, best)]
+
+
+def iter_zip(name, zip_bytes):
+    """Yield (name, bytes) for every image inside a ZIP archive"""
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield f"{name}/{info.filename}", archive.read(info)
+
+
+def iter_folder(path):
+    """Yield (name, bytes) for every image under a directory, recursively"""
+    for root, _, files in os.walk(path):
+        for filename in sorted(files):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                full_path = os.path.join(root, filename)
+                with open(full_path, "rb") as f:
+                    yield os.path.relpath(full_path, path), f.read()
+
+
+def build_batch(items, workers=8, center_crop=False):
+    """Decode (name, bytes) items concurrently into one contiguous, preprocessed float32 batch
+
+    Returns (names, batch, errors): the names of the images in batch order
+    and a dict of name -> error for images that could not be decoded.
+    """
+    items = list(items)
+    batch = allocate_batch(len(items))
+
+    def decode(i):
+        try:
+            preprocess_into(batch[i], items[i][1], center_crop)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-decode") as pool:
+        results = list(pool.map(decode, range(len(items))))
+
+    ok = [i for i, error in enumerate(results) if error is None]
+    if len(ok) < len(items):
+        batch = batch[ok]
+    names = [items[i][0] for i in ok]
+    errors = {items[i][0]: error for i, error in enumerate(results) if error is not None}
+    return names, batch, errors
+
+
+def classify_batch(worker, batch, batch_size=32, top=3, cache=None, namespace=""):
+    """Top predictions for every image in a preprocessed batch, submitted to the worker batch_size images at a time
+
+    With a PredictionCache, images already classified under the same
+    namespace (see backends.cache_namespace) are answered from it and only
+    the rest go to the model.
+    """
+    if not len(batch):
+        return []
+    results = [None] * len(batch)
+    keys = None
+    if cache is not None:
+        keys = [cache.key(image, namespace) for image in batch]
+        results = [cache.get(key, top) for key in keys]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        pending = batch if len(missing) == len(batch) else batch[missing]
+        futures = [worker.submit(pending[start:start + batch_size]) for start in range(0, len(pending), batch_size)]
+        probabilities = np.concatenate([future.result() for future in futures])
+        for i, prediction in zip(missing, decode_predictions(probabilities, top=max(top, STORED_TOP) if cache else top)):
+            if cache is not None:
+                cache.put(keys[i], prediction)
+            results[i] = prediction[:top]
+    return results
+
+
+def classify_items(worker, items, batch_size=32, workers=8, top=3, center_crop=False, cache=None, namespace=""):
+    """Decode and classify (name, bytes) items; returns (rows, timings)"""
+    start = time.perf_counter()
+    names, batch, errors = build_batch(items, workers, center_crop)
+    decoded = time.perf_counter()
+    predictions = classify_batch(worker, batch, batch_size, top, cache, namespace)
+    finished = time.perf_counter()
+
+    rows = [prediction_row(name, prediction) for name, prediction in zip(names, predictions)]
+    rows += [{"file": name, "error": error} for name, error in errors.items()]
+    timings = {"images": len(names), "failed": len(errors), "decode_seconds": decoded - start,
+               "inference_seconds": finished - decoded, "total_seconds": finished - start}
+    return rows, timings
+
+
+def prediction_row(name, prediction):
+    """Flatten one image's [(id, label, score), ...] into a table/CSV row"""
+    row = {"file": name}
+    for rank, (_, label, score) in enumerate(prediction, start=1):
+        suffix = "" if rank == 1 else f"_{rank}"
+        row[f"label{suffix}"] = label
+        row[f"score{suffix}"] = round(float(score), 4)
+    row["error"] = None
+    return row
+
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
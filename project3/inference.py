@@ -0,0 +1,149 @@
+"""Shared micro-batching inference worker
+
+Every Streamlit session submits its images to one worker instead of
+calling the model itself. The worker takes the first waiting request, then
+keeps collecting requests for up to max_wait seconds or until max_batch_size
+images are waiting. It runs them through the model in one forward pass and
+resolves each caller's future with its own rows. Under concurrent load many
+single-image calls become a few batched ones; a lone request waits at most
+max_wait.
+"""
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+IMAGE_SHAPE = (224, 224, 3)
+
+
+def keras_forward(model):
+    """Compile the model's forward pass once for any batch size of 224x224 RGB float32 images
+
+    The fixed input signature means one trace serves every batch size, where
+    predict() re-enters Keras' data pipeline on every call.
+    """
+    # Imported here so the TFLite backends never load TensorFlow
+    import tensorflow as tf
+
+    @tf.function(input_signature=[tf.TensorSpec(shape=(None, *IMAGE_SHAPE), dtype=tf.float32)])
+    def forward(images):
+        return model(images, training=False)
+
+    def run(batch):
+        return forward(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
+    return run
+
+
+class _Request:
+    __slots__ = ("images", "future", "enqueued")
+
+    def __init__(self, images):
+        self.images = images
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class InferenceWorker:
+    """Background thread that batches requests from all sessions into shared forward passes
+
+    forward(batch) takes an (N, 224, 224, 3) float32 array and returns (N, classes)
+    probabilities.
+    """
+
+    def __init__(self, forward, max_batch_size=32, max_wait=0.01):
+        self.forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.queue_waits = deque(maxlen=1000)
+        self.inference_seconds = 0.0
+        self.images = 0
+        self.request_count = 0
+        # Trace and warm up the forward pass now rather than on the first user's request
+        self.forward(np.zeros((1, *IMAGE_SHAPE), dtype=np.float32))
+        self.thread = threading.Thread(target=self._run, name="inference-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, images):
+        """Queue a (224, 224, 3) image or an (N, 224, 224, 3) batch; returns a Future of its probabilities"""
+        images = np.asarray(images, dtype=np.float32)
+        if images.ndim == 3:
+            images = images[np.newaxis]
+        request = _Request(images)
+        self.requests.put(request)
+        return request.future
+
+    def predict(self, images, timeout=None):
+        return self.submit(images).result(timeout)
+
+    def close(self):
+        self.requests.put(None)
+
+    def _collect(self, first):
+        """The first request plus whatever else arrives within max_wait, up to max_batch_size images"""
+        pending = [first]
+        count = len(first.images)
+        deadline = time.perf_counter() + self.max_wait
+        while count < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self.requests.put(None)
+                break
+            pending.append(request)
+            count += len(request.images)
+        return pending
+
+    def _run(self):
+        while (first := self.requests.get()) is not None:
+            pending = self._collect(first)
+            started = time.perf_counter()
+            batch = pending[0].images if len(pending) == 1 else np.concatenate([r.images for r in pending])
+            try:
+                # A single large request can exceed max_batch_size on its own
+                outputs = np.concatenate([self.forward(batch[i:i + self.max_batch_size])
+                                          for i in range(0, len(batch), self.max_batch_size)])
+            except Exception as e:
+                for request in pending:
+                    request.future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+
+            offset = 0
+            for request in pending:
+                request.future.set_result(outputs[offset:offset + len(request.images)])
+                offset += len(request.images)
+
+            with self.lock:
+                self.batch_sizes[len(batch)] += 1
+                self.queue_waits.extend(started - request.enqueued for request in pending)
+                self.inference_seconds += elapsed
+                self.images += len(batch)
+                self.request_count += len(pending)
+
+    def metrics(self):
+        with self.lock:
+            batches = sum(self.batch_sizes.values())
+            waits = sorted(self.queue_waits)
+            return {
+                "requests": self.request_count,
+                "images": self.images,
+                "batches": batches,
+                "mean_batch_size": self.images / batches if batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "queue_wait_p50_ms": waits[len(waits) // 2] * 1000 if waits else 0.0,
+                "queue_wait_p95_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+                "images_per_second": self.images / self.inference_seconds if self.inference_seconds else 0.0,
+                "queued": self.requests.qsize(),
+            }
@@ -1,12 +1,18 @@
-import cv2
-import numpy as np
+import itertools
+import os
+import shutil
+import tempfile
 import streamlit as st
-from tensorflow.keras.applications.mobilenet_v2 import (
-    MobileNetV2,
-    preprocess_input,
-    decode_predictions
-)
 from PIL import Image
+from preprocessing import preprocess_image
+from batch import build_batch, classify_batch, classify_items, iter_folder, iter_zip, to_csv
+from prediction_cache import DISK_DIR, PredictionCache
+from inference import InferenceWorker, keras_forward
+from backends import BACKENDS, MAX_CALIBRATION_IMAGES, cache_namespace, make_forward, parity_check
+from video import VIDEO_EXTENSIONS, classify_video, clip_summary, timeline, video_info
+
+GRID_COLUMNS = 4
+GRID_LIMIT = 48
 
 def main():
     st.set_page_config(page_title="Image Classifier", layout="wide")
@@ -18,7 +24,77 @@ def main():
         model = load_model()
         return model
     
-    model = load_cached_model()
+    @st.cache_resource
+    def get_sample_batch(folder):
+        """Preprocessed images for int8 calibration and parity checks"""
+        return build_batch(itertools.islice(iter_folder(folder), MAX_CALIBRATION_IMAGES))[1]
+    
+    # One worker per backend for all sessions, so concurrent requests share forward passes
+    @st.cache_resource
+    def get_inference_worker(backend, num_threads, sample_folder):
+        calibration = get_sample_batch(sample_folder) if sample_folder else None
+        return InferenceWorker(make_forward(backend, load_cached_model, num_threads, calibration))
+    
+    backend = st.sidebar.selectbox("Inference backend", list(BACKENDS),
+                                   help="TFLite models are converted once and cached under .cache/models")
+    num_threads = st.sidebar.number_input("TFLite threads", min_value=1, max_value=os.cpu_count() or 1,
+                                          value=os.cpu_count() or 1, disabled=BACKENDS[backend] is None)
+    sample_folder = st.sidebar.text_input("Sample images folder", help="Calibration images for int8 and the parity check")
+    if sample_folder and not os.path.isdir(sample_folder):
+        st.sidebar.error(f"Folder not found: {sample_folder}")
+        sample_folder = ""
+    
+    try:
+        with st.spinner(f"Loading {backend}..."):
+            worker = get_inference_worker(backend, num_threads if BACKENDS[backend] else None,
+                                          sample_folder if BACKENDS[backend] == "int8" else "")
+    except ValueError as e:
+        st.error(f"{e}. Set a sample images folder in the sidebar.")
+        st.stop()
+    
+    if BACKENDS[backend] and sample_folder and st.sidebar.button("Check parity against Keras"):
+        with st.sidebar:
+            with st.spinner("Comparing backends..."):
+                report = parity_check(keras_forward(load_cached_model()), worker.forward, get_sample_batch(sample_folder))
+            st.write(f"Top-1 agreement {report['top1_agreement']:.1%} on {report['images']} images "
+                     f"(max probability difference {report['max_probability_difference']:.3f})")
+            st.write(f"Keras {report['reference_ms_per_image']:.1f} ms/image, "
+                     f"{backend} {report['candidate_ms_per_image']:.1f} ms/image")
+    
+    with st.sidebar.expander("Inference worker"):
+        metrics = worker.metrics()
+        st.write(f"{metrics['requests']} requests, {metrics['images']} images in {metrics['batches']} batches "
+                 f"(mean batch {metrics['mean_batch_size']:.1f})")
+        st.write(f"Queue wait p50 {metrics['queue_wait_p50_ms']:.1f} ms, p95 {metrics['queue_wait_p95_ms']:.1f} ms; "
+                 f"{metrics['images_per_second']:.0f} images/s")
+        if metrics["batch_sizes"]:
+            st.bar_chart({str(size): count for size, count in metrics["batch_sizes"].items()})
+    
+    # Shared by all sessions; keyed by pixels, so one user's upload speeds up everyone's
+    @st.cache_resource
+    def get_prediction_cache(on_disk):
+        return PredictionCache(disk_dir=DISK_DIR if on_disk else None)
+    
+    on_disk = st.sidebar.checkbox("Keep predictions on disk", help="Reuse predictions across restarts (.cache/predictions)")
+    cache = get_prediction_cache(on_disk)
+    namespace = cache_namespace(backend, worker.forward)
+    with st.sidebar.expander("Prediction cache"):
+        cache_stats = cache.stats()
+        st.write(f"{cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%}), "
+                 f"{cache_stats['entries']} entries in memory")
+        if st.button("Clear prediction cache", help="Also deletes .cache/predictions" if on_disk else None):
+            cache.clear()
+            st.rerun()
+    
+    mode = st.radio("Mode", ["Single image", "Batch", "Video"], horizontal=True)
+    center_crop = st.checkbox("Center crop", help="Classify the largest centered square instead of squashing the whole image")
+    if mode == "Batch":
+        render_batch_mode(worker, center_crop, cache, namespace)
+        return
+    if mode == "Video":
+        render_video_mode(worker, center_crop)
+        return
+    
     uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "jpeg", "png"])
     if uploaded_file is not None:
         image = st.image(uploaded_file, caption="Uploaded Image", use_column_width=True)
@@ -26,29 +102,108 @@ def main():
         if btn:
             with st.spinner("Classifying..."):
                 image = Image.open(uploaded_file)
-                predictions = classify_image(model, image)
+                predictions = classify_image(worker, image, center_crop, cache, namespace)
                 if predictions:
                     st.subheader("Predictions:")
                     for _, label, score in predictions:
                         st.write(f"**{label}**: {score:.2%}")
 
+def render_batch_mode(worker, center_crop=False, cache=None, namespace=""):
+    uploads = st.file_uploader("Choose images (or ZIP archives of them)", type=["jpg", "jpeg", "png", "zip"],
+                               accept_multiple_files=True)
+    folder = st.text_input("...or a folder of images on this machine")
+    batch_size = st.select_slider("Batch size", options=[1, 8, 16, 32, 64, 128], value=32,
+                                  help="Images per model call; larger batches amortize the per-call overhead")
+    
+    if st.button("Classify All"):
+        items = []
+        for upload in uploads or []:
+            if upload.name.lower().endswith(".zip"):
+                items.extend(iter_zip(upload.name, upload.getvalue()))
+            else:
+                items.append((upload.name, upload.getvalue()))
+        if folder:
+            if os.path.isdir(folder):
+                items.extend(iter_folder(folder))
+            else:
+                st.error(f"Folder not found: {folder}")
+        if not items:
+            st.warning("Add some images first.")
+            return
+        
+        with st.spinner(f"Classifying {len(items)} images..."):
+            rows, timings = classify_items(worker, items, batch_size=batch_size, center_crop=center_crop,
+                                           cache=cache, namespace=namespace)
+        # Kept across reruns so the download button doesn't clear the results
+        st.session_state["batch_results"] = (rows, timings, dict(items[:GRID_LIMIT]))
+    
+    if "batch_results" not in st.session_state:
+        return
+    rows, timings, thumbnails = st.session_state["batch_results"]
+    
+    rate = timings["images"] / timings["inference_seconds"] if timings["inference_seconds"] else 0
+    st.caption(f"{timings['images']} images ({timings['failed']} unreadable) in {timings['total_seconds']:.2f}s: "
+               f"decode {timings['decode_seconds']:.2f}s, inference {timings['inference_seconds']:.2f}s ({rate:.0f} images/s)")
+    
+    grid = [row for row in rows if row["file"] in thumbnails and not row["error"]]
+    for start in range(0, len(grid), GRID_COLUMNS):
+        for column, row in zip(st.columns(GRID_COLUMNS), grid[start:start + GRID_COLUMNS]):
+            column.image(thumbnails[row["file"]], caption=f"{row['label']} ({row['score']:.0%})", use_container_width=True)
+    if len(rows) > len(grid):
+        st.caption(f"Showing {len(grid)} of {len(rows)} images; all results are in the table below.")
+    
+    st.dataframe(rows, use_container_width=True)
+    st.download_button("Download CSV", to_csv(rows), file_name="predictions.csv", mime="text/csv")
+
+def render_video_mode(worker, center_crop=False):
+    uploaded_file = st.file_uploader("Choose a video...", type=list(VIDEO_EXTENSIONS))
+    sample_fps = st.number_input("Frames per second to classify", min_value=0.1, max_value=30.0, value=1.0, step=0.5,
+                                 help="Frames in between are skipped without being decoded")
+    batch_size = st.select_slider("Batch size", options=[1, 8, 16, 32], value=16, key="video_batch_size")
+    if uploaded_file is None or not st.button("Classify Video"):
+        return
+    
+    # VideoCapture needs a path; the clip is copied to disk once and then streamed from it
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        shutil.copyfileobj(uploaded_file, f)
+        path = f.name
+    try:
+        info = video_info(path, sample_fps)
+        frame_seconds = info["frame_seconds"]
+        expected = max(1, info["samples"])
+        progress = st.progress(0.0, text=f"Classifying {info['duration']:.0f}s of video...")
+        summary_area, timeline_area, chart_area = st.empty(), st.empty(), st.empty()
+        
+        frames = []
+        for results in classify_video(worker, path, sample_fps, batch_size, center_crop=center_crop):
+            frames.extend(results)
+            progress.progress(min(len(frames) / expected, 1.0),
+                              text=f"{frames[-1]['seconds']:.1f}s / {info['duration']:.0f}s ({len(frames)} frames)")
+            with summary_area.container():
+                st.subheader("Clip summary")
+                st.dataframe(clip_summary(frames), use_container_width=True)
+            with timeline_area.container():
+                st.subheader("Timeline")
+                st.dataframe(timeline(frames, frame_seconds, info["duration"]), use_container_width=True)
+            chart_area.line_chart({"seconds": [frame["seconds"] for frame in frames],
+                                   "top-1 score": [frame["score"] for frame in frames]}, x="seconds")
+        progress.progress(1.0, text=f"Classified {len(frames)} frames")
+    except ValueError as e:
+        st.error(str(e))
+    finally:
+        os.remove(path)
+
 def load_model():
+    # TensorFlow takes seconds to import; only the Keras backend and TFLite conversion need it
+    from tensorflow.keras.applications.mobilenet_v2 import MobileNetV2
     model = MobileNetV2(weights='imagenet')
     return model
 
-def preprocess_image(image):
-    img = np.array(image)
-    img = cv2.resize(img, (224, 224))
-    img = preprocess_input(img)
-    img = np.expand_dims(img, axis=0)
-    return img
-
-def classify_image(model, image):
+def classify_image(worker, image, center_crop=False, cache=None, namespace=""):
     try:
-        img = preprocess_image(image)
-        predictions = model.predict(img)
-        decoded_predictions = decode_predictions(predictions, top=3)[0]
-        return decoded_predictions
+        img = preprocess_image(image, center_crop)
+        return classify_batch(worker, img, top=3, cache=cache, namespace=namespace)[0]
     except Exception as e:
         st.error(f"Error during image classification: {e}")
         return None
@@ -0,0 +1,97 @@
+"""Cache of predictions keyed by the decoded, preprocessed pixels
+
+The key hashes the exact tensor the model sees, together with a namespace
+that identifies the model: the digest of the converted TFLite file, which
+differs per quantization and calibration set. A re-upload, a renamed copy or a re-encode that decodes to the same
+pixels therefore hits, and a hit is guaranteed to match what the model
+would have returned. Each entry stores the top STORED_TOP predictions, so
+any smaller top= is served from the same entry.
+
+Entries live in a bounded in-memory LRU, with an optional JSON-per-entry
+disk tier under .cache/predictions that survives restarts.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+STORED_TOP = 10
+DISK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "predictions")
+
+
+class PredictionCache:
+    def __init__(self, max_entries=2048, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(image, namespace=""):
+        """Key for one preprocessed (224, 224, 3) image under a model namespace"""
+        digest = hashlib.sha256(namespace.encode("utf-8"))
+        digest.update(memoryview(image).cast("B") if image.flags.c_contiguous else image.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key, top=3):
+        """Top predictions as [(class_id, label, score), ...], or None; top must be <= STORED_TOP"""
+        with self.lock:
+            prediction = self.entries.get(key)
+            if prediction is not None:
+                self.entries.move_to_end(key)
+        if prediction is None and self.disk_dir:
+            try:
+                with open(self._path(key), encoding="utf-8") as f:
+                    prediction = [tuple(item) for item in json.load(f)]
+            except (OSError, ValueError):
+                prediction = None
+            if prediction is not None:
+                self._remember(key, prediction)
+        with self.lock:
+            if prediction is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return prediction[:top]
+
+    def _remember(self, key, prediction):
+        with self.lock:
+            self.entries[key] = prediction
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def put(self, key, prediction):
+        prediction = [(class_id, label, float(score)) for class_id, label, score in prediction[:STORED_TOP]]
+        self._remember(key, prediction)
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(prediction, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "entries": len(self.entries)}
+
+    def clear(self):
+        """Drop every entry, on disk too, and reset the counters"""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+            if self.disk_dir:
+                shutil.rmtree(self.disk_dir, ignore_errors=True)
@@ -0,0 +1,86 @@
+"""Image decode and preprocessing for MobileNetV2
+
+- JPEGs much larger than the model input are decoded at a reduced scale
+  (libjpeg's DCT scaling via Image.draft). A 12-megapixel photo is then
+  decoded at 1/8 size instead of in full before being shrunk anyway.
+- Channels are normalized explicitly: grayscale, palette and CMYK images
+  are converted to RGB, and transparent images are composited onto white
+  instead of failing on the extra alpha channel.
+- Pixels are resized once as uint8, then cast and scaled to [-1, 1] in a
+  single pass into a slot of a preallocated float32 batch, with no float
+  temporaries.
+- Optionally the largest centered square is cropped first, which keeps
+  the aspect ratio instead of squashing the image.
+"""
+import io
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+IMAGE_SIZE = 224
+
+
+def allocate_batch(count, size=IMAGE_SIZE):
+    return np.empty((count, size, size, 3), dtype=np.float32)
+
+
+def open_image(source, size=IMAGE_SIZE):
+    """Open bytes, a file-like or an unloaded PIL image, decoding JPEGs at the smallest scale that still covers size x size"""
+    image = source if isinstance(source, Image.Image) else Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    if image.format == "JPEG":
+        # Only takes effect before the pixels are loaded; picks a 1/2, 1/4 or 1/8 scale with both sides >= size
+        image.draft("RGB", (size, size))
+    # Phone photos are stored sideways with an EXIF rotation flag
+    return ImageOps.exif_transpose(image)
+
+
+def to_rgb(image):
+    """Three-channel RGB whatever the source mode"""
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def center_crop_box(width, height):
+    """Largest centered square inside width x height"""
+    side = min(width, height)
+    left = (width - side) // 2
+    top = (height - side) // 2
+    return left, top, left + side, top + side
+
+
+def preprocess_into(out, source, center_crop=False):
+    """Decode source and write MobileNetV2 input (RGB scaled to [-1, 1]) into out, a (size, size, 3) float32 view"""
+    image = open_image(source, out.shape[0])
+    if center_crop:
+        image = image.crop(center_crop_box(*image.size))
+    return preprocess_array_into(out, np.asarray(to_rgb(image)))
+
+
+def preprocess_array_into(out, pixels, center_crop=False, bgr=False):
+    """Like preprocess_into for an already decoded (height, width, 3) uint8 array, e.g. an OpenCV video frame"""
+    size = out.shape[0]
+    if center_crop:
+        left, top, right, bottom = center_crop_box(pixels.shape[1], pixels.shape[0])
+        pixels = pixels[top:bottom, left:right]
+    # INTER_AREA averages source pixels when shrinking, avoiding aliasing
+    resized = cv2.resize(pixels, (size, size), interpolation=cv2.INTER_AREA if min(pixels.shape[:2]) > size else cv2.INTER_LINEAR)
+    if bgr:
+        # Swapping channels after the resize touches 224x224 pixels instead of the full frame
+        resized = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+    np.multiply(resized, 1 / 127.5, out=out, casting="unsafe")
+    out -= 1.0
+    return out
+
+
+def preprocess_image(source, center_crop=False):
+    """A (1, 224, 224, 3) batch for a single image"""
+    batch = allocate_batch(1)
+    preprocess_into(batch[0], source, center_crop)
+    return batch
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from prediction_cache import STORED_TOP, PredictionCache
+
+PREDICTION = [(f"n{i:08d}", f"label_{i}", 1.0 / (i + 2)) for i in range(STORED_TOP)]
+
+
+def image(value=0.0):
+    return np.full((224, 224, 3), value, dtype=np.float32)
+
+
+def test_key_depends_on_pixels_and_namespace():
+    assert PredictionCache.key(image(0.5), "a") == PredictionCache.key(image(0.5).copy(), "a")
+    assert PredictionCache.key(image(0.5), "a") != PredictionCache.key(image(0.25), "a")
+    assert PredictionCache.key(image(0.5), "a") != PredictionCache.key(image(0.5), "b")
+
+
+def test_non_contiguous_images_key_like_their_contiguous_copy():
+    batch = np.random.default_rng(0).random((224, 3, 224), dtype=np.float32)
+    view = batch.transpose(0, 2, 1)
+    assert not view.flags.c_contiguous
+    assert PredictionCache.key(view) == PredictionCache.key(np.ascontiguousarray(view))
+
+
+def test_one_entry_serves_any_smaller_top():
+    cache = PredictionCache()
+    cache.put("k", PREDICTION)
+    assert cache.get("k", top=3) == PREDICTION[:3]
+    assert cache.get("k", top=STORED_TOP) == PREDICTION
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put("a", PREDICTION)
+    cache.put("b", PREDICTION)
+    cache.get("a")
+    cache.put("c", PREDICTION)
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_disk_tier_survives_a_restart_and_is_cleared(tmp_path):
+    disk_dir = tmp_path / "predictions"
+    PredictionCache(disk_dir=str(disk_dir)).put("k", PREDICTION)
+
+    cache = PredictionCache(disk_dir=str(disk_dir))
+    assert cache.get("k", top=2) == PREDICTION[:2]
+    cache.clear()
+    assert cache.get("k") is None
+    assert PredictionCache(disk_dir=str(disk_dir)).get("k") is None
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    cache = PredictionCache(disk_dir=str(tmp_path))
+    path = tmp_path / "ab" / "abcdef.json"
+    path.parent.mkdir()
+    path.write_text("{not json", encoding="utf-8")
+    assert cache.get("abcdef") is None
@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from preprocessing import allocate_batch, center_crop_box, preprocess_image, preprocess_into, to_rgb
+
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_rgb_is_returned_unchanged():
+    image = Image.new("RGB", (4, 4), (10, 20, 30))
+    assert to_rgb(image) is image
+
+
+def test_grayscale_becomes_three_equal_channels():
+    rgb = to_rgb(Image.new("L", (4, 4), 128))
+    assert rgb.mode == "RGB"
+    assert rgb.getpixel((0, 0)) == (128, 128, 128)
+
+
+def test_transparent_pixels_are_composited_onto_white():
+    image = Image.new("RGBA", (2, 1), (255, 0, 0, 255))
+    image.putpixel((1, 0), (0, 0, 0, 0))
+    rgb = to_rgb(image)
+    assert rgb.mode == "RGB"
+    assert rgb.getpixel((0, 0)) == (255, 0, 0)
+    assert rgb.getpixel((1, 0)) == (255, 255, 255)
+
+
+def test_palette_with_transparency_is_composited():
+    image = Image.new("P", (1, 1), 0)
+    image.putpalette([0, 0, 0] * 256)
+    image.info["transparency"] = 0
+    assert to_rgb(image).getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_cmyk_converts_to_rgb():
+    assert to_rgb(Image.new("CMYK", (2, 2), (0, 0, 0, 0))).getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_center_crop_box_is_the_largest_centered_square():
+    assert center_crop_box(400, 300) == (50, 0, 350, 300)
+    assert center_crop_box(300, 400) == (0, 50, 300, 350)
+
+
+def test_preprocessed_pixels_are_scaled_to_minus_one_one():
+    batch = preprocess_image(png_bytes(Image.new("LA", (300, 200), (255, 255))))
+    assert batch.shape == (1, 224, 224, 3) and batch.dtype == np.float32
+    assert np.allclose(batch, 1.0)
+
+    out = allocate_batch(1)
+    preprocess_into(out[0], png_bytes(Image.new("RGB", (50, 50), (0, 0, 0))), center_crop=True)
+    assert np.allclose(out, -1.0)
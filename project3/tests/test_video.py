@@ -0,0 +1,51 @@
+import pytest
+
+from video import clip_summary, sample_step, timeline
+
+
+def frame(seconds, label, score=0.5, predictions=None):
+    return {"seconds": seconds, "label": label, "score": score,
+            "predictions": predictions or [("id", label, score)]}
+
+
+def test_consecutive_frames_with_the_same_label_merge():
+    frames = [frame(0.0, "cat", 0.9), frame(0.5, "cat", 0.7), frame(1.0, "dog", 0.6), frame(1.5, "cat", 0.8)]
+    segments = timeline(frames, 0.5)
+    assert [(s["label"], s["start"], s["end"], s["frames"]) for s in segments] == [
+        ("cat", 0.0, 1.0, 2), ("dog", 1.0, 1.5, 1), ("cat", 1.5, 2.0, 1)]
+    assert segments[0]["mean_score"] == pytest.approx(0.8)
+
+
+def test_last_segment_ends_at_the_clip_duration():
+    frames = [frame(0.0, "cat"), frame(3.32, "cat"), frame(6.64, "dog"), frame(9.96, "dog")]
+    segments = timeline(frames, 3.32, duration=10.0)
+    assert segments[-1]["end"] == 10.0
+    assert segments[0]["end"] == 6.64
+
+
+def test_no_frames_no_segments():
+    assert timeline([], 1.0) == []
+    assert clip_summary([]) == []
+
+
+@pytest.mark.parametrize("fps, sample_fps, step", [
+    (25.0, 1.0, 25),
+    (25.0, 10.0, 2),
+    (30.0, 60.0, 1),
+    (29.97, 0.5, 60),
+])
+def test_sample_step(fps, sample_fps, step):
+    assert sample_step(fps, sample_fps) == step
+
+
+def test_clip_summary_ranks_labels_by_mean_probability():
+    frames = [
+        frame(0, "cat", 0.6, [("1", "cat", 0.6), ("2", "dog", 0.3)]),
+        frame(1, "dog", 0.5, [("2", "dog", 0.5), ("1", "cat", 0.4)]),
+        frame(2, "cat", 0.9, [("1", "cat", 0.9)]),
+    ]
+    summary = clip_summary(frames, top=2)
+    assert [row["label"] for row in summary] == ["cat", "dog"]
+    assert summary[0]["mean_score"] == pytest.approx(round(1.9 / 3, 4))
+    assert summary[0]["top1_share"] == pytest.approx(round(2 / 3, 4))
+    assert summary[1]["mean_score"] == pytest.approx(round(0.8 / 3, 4))
@@ -0,0 +1,188 @@
+"""Classification of video clips, one sampled frame at a time
+
+Frames are read with cv2.VideoCapture at sample_fps. Frames that are not
+sampled are only grabbed, not decoded. A background thread preprocesses the
+sampled frames straight into a small ring of reusable batch buffers. While
+it fills the next buffer, the current one is being classified by the shared
+inference worker. A bounded queue sits between the two threads, so memory
+stays at a few batches whatever the length of the clip.
+
+Per-frame predictions are merged into a timeline of segments with the same
+top label, and into a clip-level summary.
+"""
+import queue
+import threading
+from collections import defaultdict
+
+import cv2
+
+from batch import classify_batch
+from preprocessing import allocate_batch, preprocess_array_into
+
+VIDEO_EXTENSIONS = ("mp4", "mov", "avi", "mkv", "webm")
+# Batch buffers in flight: one being classified, one being filled, one spare
+PIPELINE_BUFFERS = 3
+
+
+def sample_step(fps, sample_fps):
+    """Every how many frames one is classified; the effective rate is fps / step, not sample_fps"""
+    return max(1, round(fps / sample_fps))
+
+
+def video_info(path, sample_fps=1.0):
+    """Frame rate, length and sampling of a clip
+
+    frame_seconds is the time each sampled frame stands for (step / fps) and
+    samples the number of frames iter_sampled_frames will yield, as far as
+    the container's frame count is accurate.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = sample_step(fps, sample_fps)
+        return {"fps": fps, "frames": frames, "duration": frames / fps, "step": step,
+                "frame_seconds": step / fps, "samples": -(-frames // step)}
+    finally:
+        capture.release()
+
+
+def iter_sampled_frames(path, sample_fps=1.0):
+    """Yield (seconds, BGR frame) for about sample_fps frames per second of video"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        step = sample_step(fps, sample_fps)
+        index = 0
+        # grab() demuxes without decoding; only sampled frames pay for retrieve()
+        while capture.grab():
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield index / fps, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+class FramePipeline:
+    """Iterates (batch, seconds) of preprocessed frames, produced by a background thread
+
+    Each batch is a view into a reused buffer, valid until the next
+    iteration.
+    """
+
+    def __init__(self, path, sample_fps=1.0, batch_size=16, center_crop=False):
+        self.path = path
+        self.sample_fps = sample_fps
+        self.batch_size = batch_size
+        self.center_crop = center_crop
+        self.free = queue.Queue()
+        for _ in range(PIPELINE_BUFFERS):
+            self.free.put(allocate_batch(batch_size))
+        self.ready = queue.Queue(maxsize=PIPELINE_BUFFERS)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._produce, name="video-decode", daemon=True)
+        self.thread.start()
+
+    def _produce(self):
+        try:
+            buffer, times = None, []
+            for seconds, frame in iter_sampled_frames(self.path, self.sample_fps):
+                if self.stopped.is_set():
+                    return
+                if buffer is None:
+                    buffer, times = self.free.get(), []
+                    if buffer is None:
+                        return
+                preprocess_array_into(buffer[len(times)], frame, self.center_crop, bgr=True)
+                times.append(seconds)
+                if len(times) == self.batch_size:
+                    self.ready.put((buffer, times))
+                    buffer = None
+            if buffer is not None and times:
+                self.ready.put((buffer, times))
+        except Exception as e:
+            self.ready.put(e)
+        finally:
+            self.ready.put(None)
+
+    def __iter__(self):
+        while (item := self.ready.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            buffer, times = item
+            yield buffer[:len(times)], times
+            self.free.put(buffer)
+
+    def close(self):
+        self.stopped.set()
+        # Unblock the producer if it is waiting for a free buffer, and drain so it isn't stuck on a full queue
+        self.free.put(None)
+        while self.thread.is_alive():
+            try:
+                self.ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def classify_video(worker, path, sample_fps=1.0, batch_size=16, top=5, center_crop=False):
+    """Yield a list of frame results per batch, as soon as the batch is classified
+
+    Each result is {"seconds", "label", "score", "predictions"}, with the top
+    predictions as [(class_id, label, score), ...].
+    """
+    pipeline = FramePipeline(path, sample_fps, batch_size, center_crop)
+    try:
+        for batch, times in pipeline:
+            predictions = classify_batch(worker, batch, batch_size, top)
+            yield [{"seconds": seconds, "label": prediction[0][1], "score": float(prediction[0][2]),
+                    "predictions": prediction} for seconds, prediction in zip(times, predictions)]
+    finally:
+        pipeline.close()
+
+
+def timeline(frames, frame_seconds, duration=None):
+    """Merge consecutive frames with the same top label into segments
+
+    Each frame covers frame_seconds (video_info's step / fps) from its
+    timestamp, cut off at the clip's duration when given.
+    """
+    segments = []
+    for frame in frames:
+        end = frame["seconds"] + frame_seconds
+        if duration:
+            end = min(end, duration)
+        if segments and segments[-1]["label"] == frame["label"]:
+            segment = segments[-1]
+            segment["end"] = end
+            segment["frames"] += 1
+            segment["mean_score"] += (frame["score"] - segment["mean_score"]) / segment["frames"]
+        else:
+            segments.append({"start": frame["seconds"], "end": end,
+                             "label": frame["label"], "frames": 1, "mean_score": frame["score"]})
+    return [{**segment, "start": round(segment["start"], 2), "end": round(segment["end"], 2),
+             "mean_score": round(segment["mean_score"], 4)} for segment in segments]
+
+
+def clip_summary(frames, top=5):
+    """Labels ranked by mean probability over all sampled frames
+
+    A label outside a frame's top predictions counts as 0 for that frame,
+    which slightly underestimates rare labels but never promotes them.
+    """
+    if not frames:
+        return []
+    totals = defaultdict(float)
+    top1 = defaultdict(int)
+    for frame in frames:
+        top1[frame["label"]] += 1
+        for _, label, score in frame["predictions"]:
+            totals[label] += float(score)
+    ranked = sorted(totals, key=totals.get, reverse=True)[:top]
+    return [{"label": label, "mean_score": round(totals[label] / len(frames), 4),
+             "top1_share": round(top1[label] / len(frames), 4)} for label in ranked]